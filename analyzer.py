@@ -10,14 +10,31 @@ import urllib.request
 import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import keras
-import tensorflow as tf
-from tensorflow.keras.applications.mobilenet_v2 import decode_predictions
+import numpy as np
 
+# tensorflow / keras / opennsfw2 импортируются внутри функций: их загрузка занимает секунды,
+# и окно должно появиться до выбора модели (см. python main.py --profile-startup)
+from autotune import AUTOTUNE_MIN_JOBS, Autotuner, batch_size_candidates, decode_worker_candidates
+from batching import BATCH_MAX_WAIT, BATCH_SIZE, PREFETCH_BATCHES, BatchInferencer
+from dedup import find_duplicates
+from ensemble import cache_version, initialize_cascade, initialize_ensemble, is_cascade, is_ensemble
+from formats import FormatStats, NotAnImageError, summarize_mislabeled
+from model_registry import MODEL_ATTRIBUTES, MODEL_CACHE_MB, MODEL_REGISTRY
+from preprocessing import (GANTMAN_SPEC, MOBILENET_SPEC, NSFW_HUB_SPEC, PREPROCESS_VERSION, TF_HUB_SPEC, YAHOO_SPEC,
+                           decode, make_loader)
+from pipeline import WorkerGate, run_decode_stage
+from process_pool import SHARD_SIZE, WorkerContext, default_process_workers, run_process_stage
+from result_cache import CACHE_PATH, ResultCache, file_signature
+from snapshot import save_folder_snapshot
+from stage_timing import StageTimer
+from ui_updates import UpdateCoalescer
 from utils import get_cpu_cores, log_message
 
 model_lock = threading.Lock()
 
+# Атрибуты, влияющие на initialize_model и предобработку: передаются в процессы пула
+WORKER_SETTINGS = ("jpeg_draft", "ensemble_combiner", "ensemble_weights", "cascade_band", "score_threshold")
+
 
 # ---------------------- ОСНОВНОЙ АНАЛИЗ ----------------------
 def analyze_images2(self):
@@ -254,220 +271,548 @@ def analyze_images(self):
     self.filter_combobox.config(state="disabled")
     self.threshold_slider.config(state="disabled")
     self.model_combobox.config(state="disabled")
+    self.combiner_combobox.config(state="disabled")
 
-    threshold = self.threshold_slider.get()
-    items = self.result_tree.get_children()
-    total_items = len(items)
-    processed_count = 0
-    max_threads = min(16, get_cpu_cores())
+    try:
+        threshold = self.threshold_slider.get()
+        jobs = self.file_store.jobs()  # (row_id, путь) строк, прошедших текущий фильтр
+
+        # Инкрементальный режим: только новые, изменённые и перемещённые с прошлого снимка папки
+        delta = getattr(self, "scan_delta", None) if getattr(self, "incremental", False) else None
+        if delta is not None:
+            changed = delta.changed_paths()
+            jobs = [(row_id, path) for row_id, path in jobs if path in changed]
+            cache = open_result_cache(self)
+            if delta.moved and cache is not None:
+                cache.rename_many(delta.moved)  # перемещённые возьмут результат из кэша
+            self.image_queue.put(("log", f"🗂 К анализу {len(jobs)} изменённых файлов из {len(self.file_store)}\n"))
+        total_items = len(jobs)
+
+        self.progress["value"] = 0
+        self.progress["maximum"] = total_items
+
+        ensure_model(self)
+
+        # Результаты уходят в UI пакетами, а не 3-4 сообщениями на каждое изображение
+        coalescer = UpdateCoalescer(self.image_queue, total_items)
+        try:
+            stats = run_analysis(self, jobs, threshold, coalesced_on_item(self, coalescer, threshold))
+        finally:
+            coalescer.close()
+
+        # Снимок сохраняем только после полного прохода без фильтра, иначе непроанализированные изменения потеряются
+        scan_root = getattr(self, "scan_root", None)
+        if (getattr(self, "incremental", False) and scan_root and not self.stop_analysis
+                and self.file_store.filter_fn is None):
+            save_folder_snapshot(self, scan_root, self.file_store.entries())
+            self.scan_delta = None
+
+        # ✅ Итоговый отчёт
+        self.image_queue.put(("log", format_report(stats)))
+        self.image_queue.put(("status", "Анализ завершен"))
+    except Exception as e:
+        # Модель не загрузилась, пул процессов сломан и т.п. — кнопки и выбор модели всё равно возвращаем
+        self.image_queue.put(("log", f"❌ Анализ прерван: {e}\n"))
+        self.image_queue.put(("status", "Анализ прерван из-за ошибки"))
+    finally:
+        self.image_queue.put(("analysis_complete", ""))
 
-    start_total = time.time()
-    log_message(f"▶ Доступно ядер: {get_cpu_cores()} | Используем потоков: {max_threads}\n", self.log_console)
+        # ✅ Разблокируем фильтр, порог и модель
+        self.filter_combobox.config(state="readonly")
+        self.threshold_slider.config(state="normal")
+        self.model_combobox.config(state="readonly")
+        self.combiner_combobox.config(state="readonly")
 
-    self.progress["value"] = 0
-    self.progress["maximum"] = total_items
-    self.progress.update()
 
-    model_name = self.model_type.get().lower()
-    is_mobilenet = "mobilenet" in model_name
-    is_gantman = "gantman" in model_name
+def ensure_model(self):
+    """Модель могли сменить в комбобоксе после прошлого анализа — переинициализируем"""
+    selected = self.model_type.get().lower()
+    if getattr(self, "predict_batch_fn", None) is None or getattr(self, "model_name", None) != selected:
+        self.initialize_model()
 
-    def process_item(item):
-        nonlocal processed_count
-        if self.stop_analysis or not self.running:
-            return
-        try:
-            img_path = self.result_tree.item(item)['values'][2]
-            start_time = time.time()
-            score, result, bad_flag = is_nude_image(self, img_path, threshold)
-            elapsed = (time.time() - start_time) * 1000.0  # мс
 
-            # BAD файлы
-            if bad_flag == "BAD":
-                self.image_queue.put((
-                    "update_item", item,
-                    {"Порог": f"{score:.4f}", "Статус": "BAD", "tag": "bad"}
-                ))
-                self.image_queue.put((
-                    "log",
-                    f"⏱ Обработка {os.path.basename(img_path)} заняла {elapsed:.1f} ms | BAD\n"
-                ))
-            else:
-                # MobileNetV2: result — label
-                if is_mobilenet:
-                    self.image_queue.put((
-                        "update_item", item,
-                        {"Порог": f"{score:.4f}", "Статус": result, "tag": "mobilenet"}
-                    ))
-                    self.image_queue.put((
-                        "log",
-                        f"⏱ Обработка {os.path.basename(img_path)} заняла {elapsed:.1f} ms | {score:.4f} — {result}\n"
-                    ))
-                # GantMan: result — label (drawings, hentai, neutral, porn, sexy)
-                elif is_gantman:
-                    self.image_queue.put((
-                        "update_item", item,
-                        {"Порог": f"{score:.4f}", "Статус": result, "tag": "mobilenet"}  # можно завести свой tag
-                    ))
-                    self.image_queue.put((
-                        "log",
-                        f"⏱ Обработка {os.path.basename(img_path)} заняла {elapsed:.1f} ms | {score:.4f} — {result}\n"
-                    ))
-                # Остальные NSFW модели: result — bool
-                else:
-                    self.image_queue.put((
-                        "update_item", item,
-                        {
-                            "Порог": f"{score:.4f}",
-                            "Статус": "✓" if result else "✗",
-                            "tag": "nude" if result else "safe"
-                        }
-                    ))
-                    self.image_queue.put((
-                        "log",
-                        f"⏱ Обработка {os.path.basename(img_path)} заняла {elapsed:.1f} ms | "
-                        f"{score:.4f} — {'НЮ' if result else 'безопасно'}\n"
-                    ))
+def coalesced_on_item(self, coalescer, threshold):
+    """on_item для run_analysis в GUI: результат строки и строка лога уходят в UpdateCoalescer.
 
-        except Exception as e:
-            self.image_queue.put(("log", f"Ошибка анализа {img_path}: {e}\n"))
+    Строка «⏱ Обработка ...» пишется, только пока включён self.verbose_timing; ошибки — всегда.
+    """
 
-        processed_count += 1
-        self.image_queue.put(("status", f"Анализ изображений... ({processed_count} / {total_items})"))
-        self.image_queue.put(("progress", processed_count))
+    def on_item(item, img_path, result, error, source, elapsed_ms):
+        if error is not None:
+            coalescer.add(item, (0.0, "BAD", None), f"[SKIP] Ошибка обработки {img_path}: {error}\n")
+        else:
+            score, label = result[:2]
+            values, verdict = format_result(score, label, threshold)
+            log_line = None
+            if getattr(self, "verbose_timing", True):
+                log_line = (f"⏱ Обработка {os.path.basename(img_path)} {describe_source(source, elapsed_ms)} | "
+                            f"{score:.4f} — {verdict}{describe_models(result)}\n")
+            coalescer.add(item, (score, values["Статус"], result[2] if len(result) > 2 else None), log_line)
+
+    return on_item
+
+
+def run_analysis(self, jobs, threshold, on_item, execution_mode=None, quiet=False, calibrate=True):
+    """Ядро анализа без Tk: кэш -> дедупликация -> декодирование -> батчевый инференс.
+
+    jobs — список (item, путь), item — любой ключ строки (row_id FileStore в GUI, путь в CLI).
+    Модель должна быть уже инициализирована (initialize_model).
+    on_item(item, path, result, error, source, elapsed_ms) вызывается для каждого файла из разных потоков;
+    result — (score, label) или (score, label, {модель: оценка}) у ансамбля и каскада, в т.ч. из кэша;
+    source — "model", "cache", "copy" или "sniff".
+    execution_mode переопределяет self.execution_mode; quiet — без строки о потоках (режим наблюдения);
+    calibrate=False — без замера батча из одного изображения (BatchInferencer), для частых маленьких пачек.
+    Возвращает словарь со статистикой для format_report.
+    """
+    cores = get_cpu_cores()
+    max_threads = getattr(self, "decode_workers", None) or min(16, cores)
+    self.score_threshold = threshold  # порог голосования ансамбля (combine "vote")
+    batch_size = getattr(self, "batch_size", BATCH_SIZE)
+    batch_max_wait = getattr(self, "batch_max_wait", BATCH_MAX_WAIT)
+    prefetch_size = getattr(self, "prefetch_size", None)
+    mode = execution_mode or getattr(self, "execution_mode", "threads")
+
+    # 🎛 Число потоков не задано явно и файлов много — подбираем потоки и батч на первых изображениях
+    autotune = (mode == "threads" and getattr(self, "autotune", True) and not getattr(self, "decode_workers", None)
+                and len(jobs) >= AUTOTUNE_MIN_JOBS)
+    if autotune:
+        workers_candidates = decode_worker_candidates(cores)
+        max_threads = workers_candidates[-1]
 
-    # ✅ Параллельная обработка
-    with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        futures = [executor.submit(process_item, item) for item in items]
-        for _ in as_completed(futures):
-            if self.stop_analysis or not self.running:
-                break
+    start_total = time.time()
+    if not quiet:
+        threads_note = f"до {max_threads} (автоподбор)" if autotune else max_threads
+        post_log(self, f"▶ Доступно ядер: {cores} | Используем потоков: {threads_note} | "
+                       f"Батч: {batch_size} (ожидание до {batch_max_wait * 1000:.0f} ms)\n")
+
+    cache = open_result_cache(self)
+    model_version = cache_version(self, threshold)
+    cascade = is_cascade(self.model_name)
+    signatures = {}  # путь -> (размер, mtime_ns) для ключа кэша
+
+    stats = {"total": len(jobs), "processed": 0, "nude": 0, "safe": 0, "bad": 0, "labeled": 0,
+             "cache_hits": 0, "copies": 0, "copy_groups": 0, "not_images": 0, "mislabeled": 0,
+             "mislabeled_kinds": "", "cascade_first": 0, "cascade_second": 0, "stage_report": "",
+             "stage_timings": ""}
+    stats_lock = threading.Lock()
+    timer = StageTimer()  # время стадий на изображение: чтение, декодирование, ..., выдача результата
+    formats = FormatStats()  # неверные расширения — по сигнатуре, которую декодер проверяет при чтении
+
+    def apply_result(item, img_path, result, error, source, elapsed_ms=None):
+        with stats_lock:
+            stats["processed"] += 1
+            if error is not None:
+                stats["bad"] += 1
+                stats["not_images"] += isinstance(error, NotAnImageError)
+            elif result[1] is not None:
+                stats["labeled"] += 1
+            elif result[0] >= threshold:
+                stats["nude"] += 1
+            else:
+                stats["safe"] += 1
+        on_item(item, img_path, result, error, source, elapsed_ms)
+
+    # 💾 Неизменённые файлы (тот же размер и mtime), уже оценённые этой моделью, не читаем вовсе
+    if cache:
+        pending = []
+        for item, img_path in jobs:
+            try:
+                signature = signatures[img_path] = file_signature(self, img_path)
+            except OSError:
+                pending.append((item, img_path))  # не удалось stat — пусть упадёт в декодере как BAD
+                continue
+            cached = cache.get(img_path, *signature, self.model_name, model_version)
+            if cached is None:
+                pending.append((item, img_path))
+            else:
+                stats["cache_hits"] += 1
+                apply_result(item, img_path, cached, None, "cache")
+        jobs = pending
+
+    def should_stop():
+        return self.stop_analysis or not self.running
+
+    # 🧬 Дедупликация: одинаковые по содержимому файлы отправляем в модель один раз
+    copies = {}  # путь оригинала -> [(item, путь копии), ...]
+    if getattr(self, "use_dedup", True):
+        jobs, copies = split_duplicates(self, jobs, signatures, max_threads)
+    stats["copies"] = sum(len(group) for group in copies.values())
+    stats["copy_groups"] = len(copies)
+
+    def on_result(key, result, error):
+        """Вызывается потоком инференса для каждого изображения из батча"""
+        item, img_path, start_time = key
+        elapsed_ms = (time.time() - start_time) * 1000.0  # включая ожидание в батче
+        apply_started = time.perf_counter()
+        group = [(item, img_path)] + copies.get(img_path, [])
+        if cascade and error is None:
+            with stats_lock:
+                stats["cascade_first"] += 1
+                stats["cascade_second"] += len(result[2]) > 1  # вторая модель запускалась
+        if cache and error is None:
+            score, label = result[:2]
+            models = result[2] if len(result) > 2 else None  # оценки моделей ансамбля и каскада
+            for _, path in group:
+                if path in signatures:
+                    cache.put(path, *signatures[path], self.model_name, model_version, score, label, models)
+        # Не-изображение отсеяно декодером по первым байтам файла
+        apply_result(item, img_path, result, error, "sniff" if isinstance(error, NotAnImageError) else "model",
+                     elapsed_ms)
+        # Копии получают тот же результат, что и оригинал
+        for copy_item, copy_path in group[1:]:
+            apply_result(copy_item, copy_path, result, error, "copy")
+        timer.record("apply", time.perf_counter() - apply_started)
+
+    def on_batch(size):
+        if tuner is not None:
+            tuner.observe_batch(size)
+
+    def process_item(job):
+        """Стадия 1: чтение и декодирование. Готовый тензор уходит в ограниченную очередь батчера (стадия 2)"""
+        item, img_path = job
+        start_time = time.time()
+        timings = {}
+        try:
+            tensor = self.load_fn(img_path, timings)
+        except Exception as e:
+            # BAD файлы: не читаются, не изображения по сигнатуре или не декодируются
+            on_result((item, img_path, start_time), None, e)
+            return
+        formats.take(img_path, timings)
+        timer.record_many(timings)
+        batcher.submit((item, img_path, start_time), tensor)
+
+    tuner = None
+    if mode == "processes":
+        # 🧩 Пул процессов: у каждого своя копия модели, GIL и сессия TF не общие
+        workers = getattr(self, "process_workers", None) or default_process_workers()
+        post_log(self, f"🧩 Режим процессов: {workers} процессов, шард {SHARD_SIZE} файлов\n")
+        shard_count = run_process_stage(jobs, self.model_name, workers, batch_size, on_result, should_stop,
+                                        worker_settings(self), timer, formats)
+        stats["stage_report"] = f"🧩 Процессов: {workers} | обработано шардов: {shard_count}\n"
+    else:
+        # ✅ Конвейер: пул чтения/декодирования -> ограниченная очередь -> батчевый инференс
+        if autotune:
+            # Очередь рассчитана на самый большой батч из пробуемых
+            candidates = batch_size_candidates(batch_size)
+            prefetch_size = prefetch_size or candidates[-1] * PREFETCH_BATCHES
+        batcher = BatchInferencer(self.predict_batch_fn, on_result, batch_size, batch_max_wait, prefetch_size,
+                                  timer, calibrate, on_batch).start()
+        gate = None
+        if autotune:
+            gate = WorkerGate(max_threads)
+
+            def apply_config(workers, new_batch_size):
+                gate.set_limit(workers)
+                batcher.batch_size = new_batch_size
+
+            # Тензоры в очереди подготовлены при прошлом варианте — в его замер они не входят
+            tuner = Autotuner(workers_candidates, batch_size, candidates, apply_config,
+                              backlog=batcher.queue.qsize, log=lambda text: post_log(self, text))
+        run_decode_stage(jobs, process_item, max_threads, should_stop, gate)
+        batcher.close()
+        stats["stage_report"] = batcher.report()
+    if cache:
+        cache.flush()
+        stats["cache_enabled"] = True
+    stats["mislabeled"] = len(formats.mislabeled)
+    stats["mislabeled_kinds"] = summarize_mislabeled(formats.mislabeled)
+
+    stats["elapsed"] = time.time() - start_total
+    stats["stage_timings"] = timer.report()
+    timings_path = getattr(self, "timings_path", None)
+    if timings_path:
+        try:
+            timer.dump(timings_path, {"model": self.model_name, "model_version": model_version,
+                                      "files": stats["total"], "elapsed_s": round(stats["elapsed"], 3)})
+        except OSError as e:
+            post_log(self, f"⚠ Не удалось записать время стадий в {timings_path}: {e}\n")
+    return stats
 
-    # ✅ Итоговый отчёт
-    nude_count = sum(1 for f in self.all_files if str(f[6]).strip() == "✓")
-    safe_count = sum(1 for f in self.all_files if str(f[6]).strip() == "✗")
-    bad_count = sum(1 for f in self.all_files if str(f[6]).strip().upper() == "BAD")
-    total = len(self.all_files)
 
-    total_elapsed = (time.time() - start_total)
+def format_report(stats):
+    """Итоговый отчёт по статистике run_analysis"""
+    elapsed = stats["elapsed"]
+    throughput = stats["processed"] / elapsed if elapsed > 0 else 0.0
     report = (
         "\n📊 Результаты анализа\n"
         f"┌──────────────────┬────────────┐\n"
-        f"│ Всего            │ {total:<10}│\n"
-        f"│ НЮ               │ {nude_count:<10}│\n"
-        f"│ Безопасные       │ {safe_count:<10}│\n"
-        f"│ BAD              │ {bad_count:<10}│\n"
+        f"│ Всего            │ {stats['total']:<10}│\n"
+        f"│ НЮ               │ {stats['nude']:<10}│\n"
+        f"│ Безопасные       │ {stats['safe']:<10}│\n"
+        f"│ С меткой класса  │ {stats['labeled']:<10}│\n"
+        f"│ BAD              │ {stats['bad']:<10}│\n"
         f"└──────────────────┴────────────┘\n"
-        f"⏱ Общее время анализа: {total_elapsed:.2f} секунд\n"
+        f"⏱ Общее время анализа: {elapsed:.2f} секунд\n"
+        f"⚡ Скорость: {throughput:.1f} изобр./сек\n"
+        f"{stats['stage_report']}"
+        f"{stats['stage_timings']}"
     )
-    self.image_queue.put(("log", report))
-    self.image_queue.put(("status", "Анализ завершен"))
-    self.image_queue.put(("analysis_complete", ""))
+    if stats.get("cache_enabled"):
+        report += f"💾 Кэш: {stats['cache_hits']} из {stats['processed']} взяты без повторного анализа\n"
+    if stats["mislabeled"] or stats["not_images"]:
+        report += (f"🔎 По сигнатуре: с неверным расширением {stats['mislabeled']}"
+                   f"{' (' + stats['mislabeled_kinds'] + ')' if stats['mislabeled_kinds'] else ''}, "
+                   f"не изображения {stats['not_images']} — пропущены без декодирования\n")
+    if stats["cascade_first"]:
+        avoided = stats["cascade_first"] - stats["cascade_second"]
+        report += (f"🪜 Каскад: точная модель проверила {stats['cascade_second']} из {stats['cascade_first']} — "
+                   f"избежано {avoided} инференсов ({avoided / stats['cascade_first']:.0%})\n")
+    if stats["copies"]:
+        report += (f"🧬 Дубликаты: {stats['copies']} копий в {stats['copy_groups']} группах — "
+                   f"сэкономлено {stats['copies']} инференсов\n")
+    return report
+
+
+def describe_source(source, elapsed_ms):
+    """Откуда взят результат — для строки лога"""
+    if source == "cache":
+        return "из кэша"
+    if source == "copy":
+        return "копия уже оценённого файла"
+    if source == "sniff":
+        return "отсеян по сигнатуре"
+    return f"заняла {elapsed_ms:.1f} ms"
+
+
+def describe_models(result):
+    """' [yahoo nsfw 0.9312 | gantman nsfw 0.7120]' — оценки моделей ансамбля для строки лога"""
+    if len(result) < 3:
+        return ""
+    return " [" + " | ".join(f"{name} {score:.4f}" for name, score in result[2].items()) + "]"
+
+
+def post_log(self, message):
+    """Лог из рабочих потоков: через очередь UI, а без UI — сразу в файл/консоль"""
+    if getattr(self, "image_queue", None) is not None:
+        self.image_queue.put(("log", message))
+    else:
+        log_message(message)
 
-    # ✅ Разблокируем фильтр, порог и модель
-    self.filter_combobox.config(state="readonly")
-    self.threshold_slider.config(state="normal")
-    self.model_combobox.config(state="readonly")
+
+def split_duplicates(self, jobs, signatures, workers):
+    """Отделяет побайтовые копии: (задания для модели, dict путь оригинала -> [(item, путь копии)])"""
+    sizes = {}
+    for _, img_path in jobs:
+        try:
+            if img_path not in signatures:
+                signatures[img_path] = file_signature(self, img_path)
+            sizes[img_path] = signatures[img_path][0]
+        except OSError:
+            continue
+
+    start = time.time()
+    duplicates, hashed = find_duplicates(sizes, workers, lambda: self.stop_analysis or not self.running)
+    if not duplicates:
+        return jobs, {}
+
+    unique_jobs = []
+    copies = {}
+    for item, img_path in jobs:
+        original = duplicates.get(img_path)
+        if original is None:
+            unique_jobs.append((item, img_path))
+        else:
+            copies.setdefault(original, []).append((item, img_path))
+    post_log(self, f"🧬 Хэшировано {hashed} файлов одинакового размера за {time.time() - start:.2f} с, "
+                   f"найдено {len(duplicates)} копий\n")
+    return unique_jobs, copies
+
+
+def worker_settings(self):
+    """Настройки модели, которые процессы пула должны повторить у себя (WorkerContext)"""
+    return {name: getattr(self, name) for name in WORKER_SETTINGS if hasattr(self, name)}
 
 
+def open_result_cache(self):
+    """Открывает постоянный кэш результатов (один на приложение), None если кэш выключен или недоступен"""
+    if not getattr(self, "use_cache", True):
+        return None
+    if getattr(self, "result_cache", None) is None:
+        try:
+            self.result_cache = ResultCache(getattr(self, "cache_path", None) or CACHE_PATH)
+        except Exception as e:
+            log_message(f"⚠ Кэш результатов недоступен: {e}\n", self.log_console)
+            self.use_cache = False
+            return None
+    return self.result_cache
+
+
+def format_result(score, label, threshold):
+    """Значения строки таблицы и вердикт для лога по результату модели"""
+    # MobileNetV2 / GantMan: result — label (drawings, hentai, neutral, porn, sexy / imagenet-класс)
+    if label is not None:
+        return {"Порог": f"{score:.4f}", "Статус": label, "tag": "mobilenet"}, label
+    # Остальные NSFW модели: сравниваем с порогом
+    is_nude = score >= threshold
+    return (
+        {"Порог": f"{score:.4f}", "Статус": "✓" if is_nude else "✗", "tag": "nude" if is_nude else "safe"},
+        "НЮ" if is_nude else "безопасно",
+    )
+
 
 # ---------------------- ИНИЦИАЛИЗАЦИЯ МОДЕЛЕЙ ----------------------
-def initialize_model(self):
-    """Инициализирует выбранную модель"""
+# Каждая модель задаёт:
+#   self.input_spec             -> preprocessing.InputSpec: размер, порядок каналов и нормализация входа
+#   self.load_fn(path, timings=None) -> тензор 224x224x3 по input_spec (общее декодирование preprocessing.decode);
+#                                  timings — dict, куда пишется время стадий read/decode/preprocess (stage_timing)
+#                                  и настоящий формат файла "format" (formats.FormatStats)
+#   self.predict_batch_fn(batch) -> список (score, label) для батча (N, 224, 224, 3); label=None у бинарных моделей
+#                                  (у ансамбля и каскада — (score, None, {модель: оценка}), см. ensemble.py)
+#   self.nsfw_batch_fn(batch)    -> список оценок NSFW 0..1 (для ансамбля); None у MobileNetV2 (классы ImageNet)
+#   self.predict_fn(path)        -> результат для одного файла (используется в is_nude_image)
+def initialize_model(self, model_name=None):
+    """Инициализирует выбранную модель (по умолчанию — из комбобокса)"""
     # ✅ Очистка предыдущей модели
     self.model = None
     self.predict_fn = None
-    self.model_name = self.model_type.get().lower()
+    self.load_fn = None
+    self.input_spec = None
+    self.predict_batch_fn = None
+    self.nsfw_batch_fn = None
+    self.model_name = (model_name or self.model_type.get()).lower()
+    self.model_version = ""  # входит в ключ кэша результатов: при смене весов/предобработки кэш не используется
+    self.threshold_in_version = False  # итог зависит от порога (голосование, каскад) — см. ensemble.cache_version
+    draft = getattr(self, "jpeg_draft", True)  # False — полное декодирование JPEG (сравнение, --full-decode)
 
     log_message(f"Инициализация модели: {self.model_name}\n", self.log_console)
 
     try:
-        if "yahoo" in self.model_name:
-            import opennsfw2
-            self.model = opennsfw2
-            self.predict_fn = lambda path: float(self.model.predict_image(path))
-            log_message("[Yahoo] ✅ Модель готова к работе\n", self.log_console)
-
-        elif "mobilenet" in self.model_name:
-            from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-            log_message("[MobileNetV2] Загрузка модели...\n", self.log_console)
-            self.model = tf.keras.applications.MobileNetV2(weights='imagenet')
-            self.preprocess_input = preprocess_input
-
-            def mobilenet_predict2(img_path):
-                img = tf.io.read_file(img_path)
-                img = tf.image.decode_jpeg(img, channels=3)
-                img = tf.image.resize(img, [224, 224])
-                img = self.preprocess_input(img)
-                img = tf.expand_dims(img, axis=0)
-                predictions = self.model.predict(img)
-                return float(predictions[0][0])
-
-            def mobilenet_predict(img_path):
-                img = tf.io.read_file(img_path)
-                img = tf.image.decode_jpeg(img, channels=3)
-                img = tf.image.resize(img, [224, 224])
-                img = self.preprocess_input(img)
-                img = tf.expand_dims(img, axis=0)
-                predictions = self.model.predict(img)
-                decoded = decode_predictions(predictions, top=1)[0]  # берём только топ‑1
-                top_id, label, prob = decoded[0]
-                # возвращаем label и вероятность
-                return label, float(prob)
-
-
-            self.predict_fn = mobilenet_predict
-            log_message("[MobileNetV2] ✅ Модель готова к работе\n", self.log_console)
-
-        elif "nsfw hub" in self.model_name:
-            import tensorflow_hub as hub
-            log_message("[NSFW Hub] Загрузка модели...\n", self.log_console)
-            self.model = hub.load("https://tfhub.dev/GourmetAI/nsfw_classifier/1")
-
-            def nsfw_hub_predict(img_path):
-                img = tf.io.read_file(img_path)
-                img = tf.image.decode_jpeg(img, channels=3)
-                img = tf.image.resize(img, [224, 224])
-                img = tf.cast(img, tf.float32) / 255.0
-                img = tf.expand_dims(img, axis=0)
-                preds = self.model(img).numpy()[0]
-                return max(preds[1], preds[3], preds[4])
-
-            self.predict_fn = nsfw_hub_predict
-            log_message("[NSFW Hub] ✅ Модель готова к работе\n", self.log_console)
-
-        elif "gantman" in self.model_name:
-            log_message("[GantMan] Инициализация...\n", self.log_console)
-            initialize_model_gantman(self)
-
-        elif "tf hub" in self.model_name:
-            import tensorflow_hub as hub
-            if not hasattr(self, 'model') or self.model is None:
-                log_message("[TF Hub] Загрузка модели...\n", self.log_console)
-                self.model = hub.load("https://tfhub.dev/google/openimages/v4/ssd/mobilenetv2/classification/4")
-
-            def tfhub_predict(img_path):
-                img = tf.io.read_file(img_path)
-                img = tf.image.decode_jpeg(img, channels=3)
-                img = tf.image.resize(img, [224, 224])
-                img = tf.expand_dims(img, axis=0)
-                return float(self.model(img).numpy()[0][1])
-
-            self.predict_fn = tfhub_predict
-            log_message("[TF Hub] ✅ Модель готова к работе\n", self.log_console)
+        log_tf_devices(self)
+
+        if is_ensemble(self.model_name):
+            initialize_ensemble(self, self.model_name, initialize_model)
+            self.predict_fn = lambda path: predict_single(self, path)[0]
+
+        elif is_cascade(self.model_name):
+            initialize_cascade(self, self.model_name, initialize_model)
+            self.predict_fn = lambda path: predict_single(self, path)[0]
 
         else:
-            log_message(f"❌ Неизвестная модель: {self.model_name}\n", self.log_console)
-            self.model = None
-            self.predict_fn = None
+            # Модели, уже загруженные в этом процессе, берутся из реестра без повторной загрузки
+            MODEL_REGISTRY.set_budget(getattr(self, "model_cache_mb", MODEL_CACHE_MB))
+            loaded = MODEL_REGISTRY.get_or_load((self.model_name, draft),
+                                                lambda: load_model(self.model_name, draft, self.log_console),
+                                                log=lambda text: log_message(text, self.log_console))
+            for attr in MODEL_ATTRIBUTES:
+                setattr(self, attr, getattr(loaded.context, attr))
+            log_message(f"🧠 В памяти: {MODEL_REGISTRY.report()}\n", self.log_console)
 
     except Exception as e:
         log_message(f"❌ Ошибка инициализации модели: {str(e)}\n", self.log_console)
         raise
 
 
+def load_model(model_name, draft=True, log_console=None):
+    """Загружает одиночную модель в новый контекст (WorkerContext) с атрибутами MODEL_ATTRIBUTES.
+
+    Функции модели замкнуты на этот контекст, поэтому его можно держать в реестре
+    и раздавать приложению, CLI и ансамблям без повторной загрузки.
+    """
+    import tensorflow as tf
+
+    self = WorkerContext()
+    self.log_console = log_console
+    self.jpeg_draft = draft
+    self.model_name = model_name
+    self.model_version = ""
+
+    if "yahoo" in self.model_name:
+        import opennsfw2
+        self.model = opennsfw2.make_open_nsfw_model()
+        self.model_version = f"opennsfw2-{getattr(opennsfw2, '__version__', '')}"
+
+        def yahoo_predict_batch(batch):
+            preds = outputs_to_numpy(self.model(batch, training=False))
+            return [(float(p[1]), None) for p in preds]
+
+        self.input_spec = YAHOO_SPEC
+        self.predict_batch_fn = yahoo_predict_batch
+        self.nsfw_batch_fn = lambda batch: [score for score, _ in yahoo_predict_batch(batch)]
+        self.predict_fn = lambda path: predict_single(self, path)[0]
+        log_message("[Yahoo] ✅ Модель готова к работе\n", self.log_console)
+
+    elif "mobilenet" in self.model_name:
+        from tensorflow.keras.applications.mobilenet_v2 import decode_predictions
+        log_message("[MobileNetV2] Загрузка модели...\n", self.log_console)
+        self.model = tf.keras.applications.MobileNetV2(weights='imagenet')
+        self.model_version = f"mobilenet_v2-imagenet-tf{tf.__version__}"
+
+        def mobilenet_predict_batch(batch):
+            predictions = outputs_to_numpy(self.model(batch, training=False))
+            decoded = decode_predictions(predictions, top=1)  # берём только топ‑1
+            return [(float(prob), label) for (_, label, prob), in decoded]
+
+        def mobilenet_predict(img_path):
+            prob, label = predict_single(self, img_path)
+            # возвращаем label и вероятность
+            return label, prob
+
+        self.input_spec = MOBILENET_SPEC
+        self.predict_batch_fn = mobilenet_predict_batch
+        self.predict_fn = mobilenet_predict
+        log_message("[MobileNetV2] ✅ Модель готова к работе\n", self.log_console)
+
+    elif "nsfw hub" in self.model_name:
+        import tensorflow_hub as hub
+        log_message("[NSFW Hub] Загрузка модели...\n", self.log_console)
+        self.model = hub.load("https://tfhub.dev/GourmetAI/nsfw_classifier/1")
+        self.model_version = "GourmetAI/nsfw_classifier/1"
+
+        def nsfw_hub_predict_batch(batch):
+            preds = outputs_to_numpy(self.model(batch))
+            return [(float(max(p[1], p[3], p[4])), None) for p in preds]
+
+        self.input_spec = NSFW_HUB_SPEC
+        self.predict_batch_fn = nsfw_hub_predict_batch
+        self.nsfw_batch_fn = lambda batch: [score for score, _ in nsfw_hub_predict_batch(batch)]
+        self.predict_fn = lambda path: predict_single(self, path)[0]
+        log_message("[NSFW Hub] ✅ Модель готова к работе\n", self.log_console)
+
+    elif "gantman" in self.model_name:
+        log_message("[GantMan] Инициализация...\n", self.log_console)
+        initialize_model_gantman(self)
+
+    elif "tf hub" in self.model_name:
+        import tensorflow_hub as hub
+        log_message("[TF Hub] Загрузка модели...\n", self.log_console)
+        self.model = hub.load("https://tfhub.dev/google/openimages/v4/ssd/mobilenetv2/classification/4")
+        self.model_version = "google/openimages/v4/ssd/mobilenetv2/classification/4"
+
+        def tfhub_predict_batch(batch):
+            preds = outputs_to_numpy(self.model(batch))
+            return [(float(p[1]), None) for p in preds]
+
+        self.input_spec = TF_HUB_SPEC
+        self.predict_batch_fn = tfhub_predict_batch
+        self.nsfw_batch_fn = lambda batch: [score for score, _ in tfhub_predict_batch(batch)]
+        self.predict_fn = lambda path: predict_single(self, path)[0]
+        log_message("[TF Hub] ✅ Модель готова к работе\n", self.log_console)
+
+    else:
+        log_message(f"❌ Неизвестная модель: {self.model_name}\n", self.log_console)
+
+    if self.input_spec is not None:
+        # Одна предобработка для всех моделей: декодирование общее, различается только input_spec
+        self.load_fn = make_loader(self.input_spec, draft)
+        self.model_version += f"+{PREPROCESS_VERSION}{'' if draft else '-full-decode'}"
+    return self
+
+
+def log_tf_devices(self):
+    """Один раз пишет в лог устройства TensorFlow (раньше это делалось при старте приложения)"""
+    if getattr(self, "tf_devices_logged", False):
+        return
+    import tensorflow as tf
+    self.tf_devices_logged = True
+    log_message(f"TensorFlow {tf.__version__} | Доступные устройства: {tf.config.list_physical_devices()}\n",
+                self.log_console)
+
+
 def initialize_model_gantman(self):
     """Скачивает и инициализирует GantMan NSFW модель"""
+    import keras
+
     model_dir = "nsfw_model_mobilenet_v2"
     saved_model_path = os.path.join(model_dir, "mobilenet_v2_140_224")
     zip_path = "nsfw_model.zip"
@@ -495,12 +840,17 @@ def initialize_model_gantman(self):
 
         log_message(f"[GantMan] Загружаем модель из {saved_model_path}...\n", self.log_console)
         self.model = keras.layers.TFSMLayer(saved_model_path, call_endpoint='serving_default')
+        self.model_version = "GantMan/nsfw_model/mobilenet_v2_140_224"
+        self.input_spec = GANTMAN_SPEC
+        self.nsfw_batch_fn = lambda batch: gantman_nsfw_batch(self, batch)
+        self.predict_batch_fn = lambda batch: predict_gantman_batch(self, batch)
         self.predict_fn = lambda path: predict_gantman(self, path)
         log_message("✅ [GantMan] Модель готова к работе\n", self.log_console)
 
 
 # ---------------------- PREDICT ФУНКЦИИ ----------------------
 def predict_gantman2(self, img_path: str) -> float:
+    import tensorflow as tf
     img = tf.io.read_file(img_path)
     img = tf.image.decode_jpeg(img, channels=3)
     img = tf.image.resize(img, [224, 224])
@@ -513,29 +863,43 @@ def predict_gantman2(self, img_path: str) -> float:
         scores = outputs.numpy()[0]
     return float(max(scores[1], scores[3], scores[4]))
 
-import numpy as np
+def load_gantman(img_path: str, draft=True):
+    return GANTMAN_SPEC.transform(decode(img_path, (GANTMAN_SPEC,), draft))
 
-def predict_gantman(self, img_path: str):
-    img = tf.io.read_file(img_path)
-    img = tf.image.decode_jpeg(img, channels=3)
-    img = tf.image.resize(img, [224, 224])
-    img = tf.cast(img, tf.float32) / 255.0
-    img = tf.expand_dims(img, 0)
 
-    outputs = self.model(img)
-    if isinstance(outputs, dict):
-        scores = list(outputs.values())[0].numpy()[0]
-    else:
-        scores = outputs.numpy()[0]
+def predict_gantman_batch(self, batch):
+    scores = outputs_to_numpy(self.model(batch))
 
     labels = ["drawings", "hentai", "neutral", "porn", "sexy"]
-    best_idx = int(np.argmax(scores))
-    best_label = labels[best_idx]
-    best_score = float(scores[best_idx])
+    results = []
+    for row in scores:
+        best_idx = int(np.argmax(row))
+        results.append((float(row[best_idx]), labels[best_idx]))
+    return results
+
 
+def gantman_nsfw_batch(self, batch):
+    """Оценка NSFW GantMan для ансамбля: максимум из hentai, porn и sexy (как в predict_gantman2)"""
+    return [float(max(row[1], row[3], row[4])) for row in outputs_to_numpy(self.model(batch))]
+
+
+def predict_gantman(self, img_path: str):
+    best_score, best_label = predict_gantman_batch(self, np.expand_dims(load_gantman(img_path), 0))[0]
     return best_score, best_label
 
 
+def predict_single(self, img_path: str):
+    """Прогон одного файла через батчевый путь модели: (score, label)"""
+    return self.predict_batch_fn(np.expand_dims(self.load_fn(img_path), 0))[0]
+
+
+def outputs_to_numpy(outputs):
+    """Выход модели (тензор или dict у TFSMLayer) -> np.ndarray (N, classes)"""
+    if isinstance(outputs, dict):
+        outputs = list(outputs.values())[0]
+    return np.asarray(outputs)
+
+
 # ---------------------- ОСНОВНОЙ ВЫЗОВ ----------------------
 def is_nude_image2(self, img_path: str, threshold: float):
     try:
@@ -598,7 +962,7 @@ def is_nude_image(self, img_path: str, threshold: float):
     try:
         current_name = self.model_type.get().lower()
 
-        if not hasattr(self, 'predict_fn') or self.predict_fn is None:
+        if getattr(self, 'predict_fn', None) is None or getattr(self, 'model_name', None) != current_name:
             self.initialize_model()
 
         # GantMan
@@ -0,0 +1,99 @@
+import threading
+import time
+
+AUTOTUNE_IMAGES = 300  # не меньше стольких изображений на замеры всех вариантов (без прогрева)
+AUTOTUNE_WINDOW_BATCHES = 3  # замер варианта — не короче стольких самых больших батчей
+AUTOTUNE_MIN_JOBS = 5000  # на меньших прогонах калибровка не окупается — значения по умолчанию
+AUTOTUNE_TOLERANCE = 0.05  # вариант в пределах 5% от лучшего считается равным, берётся более лёгкий
+MAX_DECODE_WORKERS = 32
+
+
+def decode_worker_candidates(cores):
+    """Половина ядер, все ядра и вдвое больше (чтение с медленного диска или сети ждёт I/O, а не CPU)"""
+    return sorted({max(1, cores // 2), cores, min(MAX_DECODE_WORKERS, cores * 2)})
+
+
+def batch_size_candidates(batch_size):
+    return sorted({max(1, batch_size // 2), batch_size, batch_size * 2})
+
+
+class Autotuner:
+    """Подбор числа потоков декодирования и размера батча по измеренной скорости на первых изображениях.
+
+    Сначала по очереди пробуются workers_candidates (при исходном батче), затем для лучшего числа
+    потоков — batch_candidates. Скорость считается по выданным батчам (после инференса), то есть
+    по всему конвейеру: если узкое место — модель, варианты потоков сравняются и выберется меньшее число.
+
+    Замер честный для любого размера батча: результаты батча выдаются разом, поэтому отсчёт идёт
+    от конца батча до конца батча, а окно — не короче AUTOTUNE_WINDOW_BATCHES самых больших батчей.
+    После каждого apply идёт прогрев: тензоры, подготовленные ещё при прошлом варианте (backlog() —
+    сколько их в очереди), и один самый большой батч в замер не входят.
+    apply(workers, batch_size) применяет вариант к работающему конвейеру (WorkerGate, BatchInferencer).
+    """
+
+    def __init__(self, workers_candidates, batch_size, batch_candidates, apply, calibration_images=AUTOTUNE_IMAGES,
+                 backlog=lambda: 0, log=print):
+        self.workers_candidates = workers_candidates
+        self.batch_candidates = batch_candidates
+        self.apply = apply
+        self.backlog = backlog
+        self.log = log
+        trials = len(workers_candidates) + len(batch_candidates) - 1
+        self.largest_batch = max(batch_candidates)
+        self.window = max(self.largest_batch * AUTOTUNE_WINDOW_BATCHES, calibration_images // trials)
+        self.lock = threading.Lock()
+
+        self.pending = [(workers, batch_size) for workers in workers_candidates]
+        self.measured = {}  # (потоки, батч) -> изобр./с
+        self.current = None
+        self.warmup = 0  # сколько результатов ещё пропустить до начала замера
+        self.count = 0
+        self.started = None
+        self.best = None
+        self._next_trial()
+
+    def observe_batch(self, size):
+        """Вызывается после выдачи результатов каждого батча (size изображений)"""
+        with self.lock:
+            if self.best is not None:
+                return
+            now = time.perf_counter()
+            if self.warmup > 0:
+                self.warmup -= size
+                if self.warmup <= 0:
+                    self.started = now  # граница батча: замер начинается с конца прогрева
+                return
+            self.count += size
+            if self.count < self.window:
+                return
+            self.measured[self.current] = self.count / max(now - self.started, 1e-9)
+            if not self.pending and len(self.measured) == len(self.workers_candidates):
+                # Потоки выбраны — теперь размер батча
+                workers = self._choose()[0]
+                self.pending = [(workers, batch) for batch in self.batch_candidates
+                                if (workers, batch) not in self.measured]
+            if self.pending:
+                self._next_trial()
+            else:
+                self.best = self._choose()
+                self.apply(*self.best)
+                self.log(self.report())
+
+    def _next_trial(self):
+        self.current = self.pending.pop(0)
+        self.count = 0
+        self.apply(*self.current)
+        self.warmup = self.backlog() + self.largest_batch
+
+    def _choose(self):
+        """Самый быстрый вариант; из почти равных — с меньшим числом потоков и батчем"""
+        fastest = max(self.measured.values())
+        good = [config for config, rate in self.measured.items() if rate >= fastest * (1 - AUTOTUNE_TOLERANCE)]
+        return min(good)
+
+    def report(self):
+        if self.best is None:
+            return ""
+        tried = ", ".join(f"{workers}×{batch}: {rate:.1f}" for (workers, batch), rate in sorted(self.measured.items()))
+        return (f"🎛 Автоподбор: потоков декодирования {self.best[0]}, батч {self.best[1]} — "
+                f"{self.measured[self.best]:.1f} изобр./с (потоки×батч: изобр./с — {tried})\n")
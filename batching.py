@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+# ---------------------- ПАРАМЕТРЫ ПО УМОЛЧАНИЮ ----------------------
+BATCH_SIZE = 32  # максимальный размер микробатча
+BATCH_MAX_WAIT = 0.05  # сколько секунд ждём добора батча после первого тензора
+PREFETCH_BATCHES = 4  # сколько батчей готовых тензоров может ждать инференса (ограничивает память)
+
+_STOP = object()
+
+
+class BatchInferencer:
+    """Собирает готовые тензоры от воркеров в микробатчи и прогоняет их через модель одним вызовом.
+
+    predict_batch_fn(batch) получает np.ndarray формы (N, H, W, C) и возвращает список из N результатов.
+    on_result(key, result, error) вызывается для каждого изображения из потока инференса; если он сам
+    упал (например, запись в кэш), для этого изображения он вызывается ещё раз с ошибкой, а поток работает дальше.
+    Очередь ограничена prefetch тензорами: если модель не успевает, submit блокирует декодирующие потоки.
+    timer (stage_timing.StageTimer) получает ожидание каждого тензора до прогона ("queue")
+    и его долю времени прогона батча ("inference").
+    calibrate=False — без замера батча из одного изображения (два лишних прогона модели на первом батче).
+    on_batch(число изображений) вызывается после выдачи результатов каждого батча (autotune.Autotuner).
+    """
+
+    def __init__(self, predict_batch_fn, on_result, batch_size=BATCH_SIZE, max_wait=BATCH_MAX_WAIT, prefetch=None,
+                 timer=None, calibrate=True, on_batch=None):
+        self.predict_batch_fn = predict_batch_fn
+        self.timer = timer
+        self.calibrate = calibrate
+        self.on_batch = on_batch
+        self.on_result = on_result
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        if prefetch is None:
+            prefetch = self.batch_size * PREFETCH_BATCHES
+        self.queue = queue.Queue(maxsize=max(self.batch_size, int(prefetch)))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.stats_lock = threading.Lock()
+
+        # Статистика для итогового отчёта
+        self.batches = 0
+        self.images = 0
+        self.forward_time = 0.0
+        self.single_ms = None  # время прогона батча из одного изображения (для сравнения)
+        self.idle_time = 0.0  # модель простаивала в ожидании тензоров
+        self.blocked_time = 0.0  # декодеры ждали места в очереди (суммарно по потокам)
+        self.callback_errors = 0  # исключений в on_result
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, key, tensor):
+        """Ставит тензор в очередь на инференс, блокируется при заполненной очереди"""
+        entry = (key, tensor, time.perf_counter())
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put(entry)
+            with self.stats_lock:
+                self.blocked_time += time.perf_counter() - start
+
+    def close(self):
+        """Дожидается обработки всех поставленных тензоров и останавливает поток"""
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    # ---------------------- ПОТОК ИНФЕРЕНСА ----------------------
+    def _collect(self):
+        """Набирает батч: до batch_size элементов или пока не истечёт max_wait"""
+        start = time.perf_counter()
+        first = self.queue.get()
+        self.idle_time += time.perf_counter() - start
+        if first is _STOP:
+            return [], True
+
+        pending = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(pending) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                entry = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return pending, True
+            pending.append(entry)
+        return pending, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            pending, stopped = self._collect()
+            if pending:
+                self._process(pending)
+                if self.on_batch is not None:
+                    self.on_batch(len(pending))
+
+    def _process(self, pending):
+        keys = [key for key, _, _ in pending]
+        tensors = [tensor for _, tensor, _ in pending]
+
+        if self.calibrate and self.single_ms is None:
+            self._calibrate(tensors[0])
+
+        try:
+            batch = np.stack(tensors)
+            start = time.perf_counter()
+            results = self.predict_batch_fn(batch)
+            forward = time.perf_counter() - start
+            self.forward_time += forward
+            self.batches += 1
+            self.images += len(keys)
+        except Exception:
+            # Один битый тензор не должен валить весь батч — прогоняем поштучно
+            self._record_queue_wait(pending, time.perf_counter())
+            self._process_one_by_one(keys, tensors)
+            return
+
+        if self.timer is not None:
+            self._record_queue_wait(pending, start)
+            self.timer.record_each("inference", [forward / len(keys)] * len(keys))
+
+        for key, result in zip(keys, results):
+            self._deliver(key, result, None)
+
+    def _process_one_by_one(self, keys, tensors):
+        for key, tensor in zip(keys, tensors):
+            try:
+                start = time.perf_counter()
+                result = self.predict_batch_fn(np.expand_dims(tensor, 0))[0]
+                forward = time.perf_counter() - start
+                self.forward_time += forward
+                self.batches += 1
+                self.images += 1
+                if self.timer is not None:
+                    self.timer.record("inference", forward)
+            except Exception as e:
+                self._deliver(key, None, e)
+            else:
+                self._deliver(key, result, None)
+
+    def _deliver(self, key, result, error):
+        """on_result без риска для потока: если он упадёт, поток остановится, очередь заполнится
+        и декодеры навсегда заблокируются в submit(), а close() — в join()"""
+        try:
+            self.on_result(key, result, error)
+        except Exception as e:
+            self.callback_errors += 1
+            if error is None:
+                try:
+                    self.on_result(key, None, e)  # изображение засчитывается как BAD с причиной
+                except Exception:
+                    pass
+
+    def _record_queue_wait(self, pending, started):
+        """От submit до начала прогона: очередь, добор батча и калибровка на первом батче"""
+        if self.timer is not None:
+            self.timer.record_each("queue", [started - submitted for _, _, submitted in pending])
+
+    def _calibrate(self, tensor):
+        """Замеряет прогон батча из одного изображения (первый вызов — прогрев модели)"""
+        try:
+            single = np.expand_dims(tensor, 0)
+            self.predict_batch_fn(single)
+            start = time.perf_counter()
+            self.predict_batch_fn(single)
+            self.single_ms = (time.perf_counter() - start) * 1000.0
+        except Exception:
+            self.single_ms = 0.0
+
+    # ---------------------- СТАТИСТИКА ----------------------
+    def report(self):
+        """Строка для итогового отчёта: размер батчей и выигрыш относительно батча из одного"""
+        if not self.images:
+            return ""
+        avg_batch = self.images / self.batches
+        per_image_ms = self.forward_time * 1000.0 / self.images
+        line = f"📦 Батчей: {self.batches} | средний размер {avg_batch:.1f} | инференс {per_image_ms:.1f} ms/изобр."
+        if self.single_ms and per_image_ms > 0:
+            line += f" (батч из 1: {self.single_ms:.1f} ms, ускорение ×{self.single_ms / per_image_ms:.1f})"
+        line += (f"\n🚦 Очередь {self.queue.maxsize} тензоров | модель ждала данные {self.idle_time:.2f} с | "
+                 f"декодеры ждали модель {self.blocked_time:.2f} с")
+        if self.callback_errors:
+            line += f"\n⚠ Ошибок при выдаче результата: {self.callback_errors}"
+        return line + "\n"
@@ -0,0 +1,114 @@
+"""Декодирование JPEG в полном разрешении против draft (DCT scaling): python -m benchmarks.bench_decode
+
+full  — полное декодирование и сжатие до 224x224 (как было до preprocessing.load_rgb).
+draft — preprocessing.load_rgb: libjpeg декодирует сразу в 1/2, 1/4 или 1/8 размера.
+tf    — прежний путь моделей: tf.image.decode_jpeg + tf.image.resize (если установлен TensorFlow).
+
+Расхождение считается по пикселям входа модели, а с --model — и по оценкам модели.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import INPUT_SIZE, load_rgb
+
+
+def make_jpegs(folder, count, size, quality=90):
+    """Синтетические «фото»: плавные градиенты, крупные пятна и шум — похоже на камеру по сжатию"""
+    rng = np.random.default_rng(0)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    paths = []
+    for index in range(count):
+        phase = rng.uniform(0, 2 * np.pi, 3)
+        freq = rng.uniform(2, 12, 3) / max(width, height)
+        channels = [127 + 100 * np.sin(x * freq[c] + y * freq[(c + 1) % 3] + phase[c]) for c in range(3)]
+        pixels = np.stack(channels, axis=-1) + rng.normal(0, 4, (height, width, 3))
+        path = os.path.join(folder, f"photo_{index:04d}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, quality=quality)
+        paths.append(path)
+    return paths
+
+
+def tf_load(img_path):
+    import tensorflow as tf
+    img = tf.image.decode_jpeg(tf.io.read_file(img_path), channels=3)
+    return tf.cast(tf.image.resize(img, INPUT_SIZE), tf.uint8).numpy()
+
+
+def measure(name, load, paths, repeats):
+    best = None
+    tensors = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        tensors = [load(path) for path in paths]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<6} {len(paths) / best:8.1f} изобр./с  {best / len(paths) * 1000:7.2f} ms/изобр.")
+    return best, np.stack(tensors).astype(np.float32)
+
+
+def score_drift(model_name, paths):
+    """|оценка(full) - оценка(draft)| по каждому файлу через настоящие загрузчики модели"""
+    from analyzer import initialize_model
+    from process_pool import WorkerContext
+
+    scores = []
+    for jpeg_draft in (False, True):
+        ctx = WorkerContext()
+        ctx.jpeg_draft = jpeg_draft
+        initialize_model(ctx, model_name)
+        batch = np.stack([ctx.load_fn(path) for path in paths])
+        scores.append(np.array([score for score, _ in ctx.predict_batch_fn(batch)]))
+    return np.abs(scores[0] - scores[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк декодирования JPEG")
+    parser.add_argument("--files", type=int, default=50, help="сколько JPEG создать")
+    parser.add_argument("--size", default="4000x3000", help="размер синтетических снимков, ШxВ")
+    parser.add_argument("--folder", default=None, help="взять JPEG из папки вместо синтетических")
+    parser.add_argument("--repeats", type=int, default=3, help="повторов, берётся лучший")
+    parser.add_argument("--model", default=None, help="сравнить оценки модели (yahoo, mobilenet, ...)")
+    args = parser.parse_args(argv)
+
+    folder = args.folder
+    cleanup = folder is None
+    if folder is None:
+        folder = tempfile.mkdtemp(prefix="nsfw_decode_bench_")
+        size = tuple(int(v) for v in args.size.lower().split("x"))
+        started = time.perf_counter()
+        paths = make_jpegs(folder, args.files, size)
+        print(f"Создано {len(paths)} JPEG {size[0]}x{size[1]} за {time.perf_counter() - started:.1f} s")
+    else:
+        paths = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                       if name.lower().endswith((".jpg", ".jpeg")))[:args.files]
+
+    try:
+        full_time, full = measure("full", lambda p: load_rgb(p, draft=False), paths, args.repeats)
+        draft_time, draft = measure("draft", load_rgb, paths, args.repeats)
+        print(f"Ускорение декодирования: x{full_time / draft_time:.2f}")
+        try:
+            tf_time, _ = measure("tf", tf_load, paths, args.repeats)
+            print(f"  против tf.image.decode_jpeg: x{tf_time / draft_time:.2f}")
+        except ImportError:
+            print("tf     TensorFlow не установлен — пропущено")
+
+        diff = np.abs(full - draft)
+        print(f"Пиксели (0..255): средняя разница {diff.mean():.2f}, 99-й перцентиль {np.percentile(diff, 99):.1f}")
+        if args.model:
+            drift = score_drift(args.model, paths)
+            print(f"Оценки {args.model}: средний сдвиг {drift.mean():.4f}, максимальный {drift.max():.4f}")
+    finally:
+        if cleanup:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
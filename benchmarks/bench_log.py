@@ -0,0 +1,79 @@
+"""Накладные расходы лога на изображение: python -m benchmarks.bench_log --images 100000
+
+open/close — прежний log_message: открыть файл, дописать строку, закрыть — на каждое сообщение.
+writer     — log_writer.LogWriter: строка кладётся в буфер, файл пишет фоновый поток пачками.
+
+Сообщения пишутся из --threads потоков (как ошибки декодирования из пула), по --lines на изображение.
+Вывод в консоль Python в обоих вариантах одинаков и не измеряется.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from log_writer import LogWriter
+
+
+def write_open_close(path):
+    def write(message):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(message)
+    return write, lambda: None
+
+
+def write_buffered(path, max_bytes):
+    writer = LogWriter(path, max_bytes=max_bytes)
+    return writer.write, writer.close
+
+
+def measure(name, make_writer, images, lines, threads):
+    write, close = make_writer()
+    per_thread = images // threads
+
+    def worker(index):
+        for image in range(per_thread):
+            for line in range(lines):
+                write(f"[{index}] /data/photos/{image:07d}.jpg: строка {line} лога анализа\n")
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    logged = time.perf_counter() - started
+    close()
+    total = time.perf_counter() - started
+    count = per_thread * threads
+    print(f"{name:<10} {logged / count * 1e6:8.2f} мкс/изобр. в потоках анализа  "
+          f"(с дозаписью на диск: {total:.2f} с на {count} изобр.)")
+    return logged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк записи лога")
+    parser.add_argument("--images", type=int, default=100000, help="сколько изображений «проанализировать»")
+    parser.add_argument("--lines", type=int, default=1, help="строк лога на изображение")
+    parser.add_argument("--threads", type=int, default=4, help="пишущих потоков")
+    parser.add_argument("--max-mb", type=float, default=10, help="ротация writer после стольких МБ")
+    args = parser.parse_args(argv)
+
+    folder = tempfile.mkdtemp(prefix="nsfw_log_bench_")
+    try:
+        old_path = os.path.join(folder, "open_close.log")
+        new_path = os.path.join(folder, "writer.log")
+        old = measure("open/close", lambda: write_open_close(old_path), args.images, args.lines, args.threads)
+        new = measure("writer", lambda: write_buffered(new_path, int(args.max_mb * 2 ** 20)),
+                      args.images, args.lines, args.threads)
+        print(f"Ускорение: x{old / new:.1f}")
+        rotated = sorted(name for name in os.listdir(folder) if name.startswith("writer.log."))
+        print(f"Ротация: {', '.join(rotated) or 'не понадобилась'}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Сравнение сканеров на синтетическом дереве: python -m benchmarks.bench_scan --files 1000000
+
+walk+stat — прежний scan_folder_async: сначала весь os.walk, потом os.stat каждого файла.
+scandir   — scanner.iter_image_files: один проход, строки отдаются по мере обхода.
+parallel  — scanner.iter_image_files_parallel с --scan-workers потоками (и в режиме ordered).
+
+--latency-ms добавляет задержку к каждому листингу папки, имитируя сетевой диск.
+"""
+
+import argparse
+import functools
+import os
+import shutil
+import tempfile
+import time
+
+from scanner import SCAN_BATCH, SUPPORTED_FORMATS, iter_image_files, iter_image_files_parallel
+
+
+def make_tree(root, files, per_dir=1000, fanout=10):
+    """Создаёт дерево пустых файлов: per_dir изображений (+10% не-изображений) в каждой папке"""
+    dirs_needed = max(1, files // per_dir)
+    created = 0
+    for index in range(dirs_needed):
+        # Раскладываем папки по нескольким уровням: root/a/b/d<index>
+        directory = os.path.join(root, str(index % fanout), str(index // fanout % fanout), f"d{index}")
+        os.makedirs(directory, exist_ok=True)
+        count = min(per_dir, files - created)
+        for i in range(count):
+            open(os.path.join(directory, f"img_{i:05d}.jpg"), "wb").close()
+        for i in range(count // 10):
+            open(os.path.join(directory, f"note_{i:05d}.txt"), "wb").close()
+        created += count
+    return created
+
+
+def scan_walk_then_stat(folder):
+    """Прежняя реализация; возвращает (число файлов, время до первой пачки строк)"""
+    started = time.perf_counter()
+    paths = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith(SUPPORTED_FORMATS):
+                paths.append(os.path.join(root, file))
+    first_batch = None
+    rows = 0
+    for path in paths:
+        os.stat(path)
+        rows += 1
+        if first_batch is None and rows >= SCAN_BATCH:
+            first_batch = time.perf_counter() - started
+    return rows, first_batch
+
+
+def scan_streaming(folder, scan=iter_image_files):
+    started = time.perf_counter()
+    first_batch = None
+    rows = 0
+    for _ in scan(folder):
+        rows += 1
+        if first_batch is None and rows >= SCAN_BATCH:
+            first_batch = time.perf_counter() - started
+    return rows, first_batch
+
+
+def add_listing_latency(latency):
+    """Подменяет os.scandir так, чтобы каждый листинг папки ждал latency секунд"""
+    original = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(latency)
+        return original(path)
+
+    os.scandir = slow_scandir
+
+
+def measure(name, scan, folder, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows, first_batch = scan(folder)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, first_batch, rows)
+    elapsed, first_batch, rows = best
+    first = f"{first_batch * 1000:8.1f} ms" if first_batch is not None else "       —"
+    print(f"{name:<12} {rows:>9} файлов  всего {elapsed:7.2f} s  "
+          f"первые {SCAN_BATCH} строк {first}  {rows / elapsed:9.0f} файлов/с")
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк сканирования папки")
+    parser.add_argument("--files", type=int, default=1_000_000, help="сколько изображений создать")
+    parser.add_argument("--per-dir", type=int, default=1000, help="изображений в одной папке")
+    parser.add_argument("--root", default=None, help="готовое дерево (не создавать и не удалять)")
+    parser.add_argument("--repeats", type=int, default=3, help="повторов, берётся лучший")
+    parser.add_argument("--scan-workers", type=int, default=16, help="потоков для параллельного обхода")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка листинга папки, мс")
+    args = parser.parse_args(argv)
+
+    root = args.root
+    cleanup = root is None
+    if root is None:
+        root = tempfile.mkdtemp(prefix="nsfw_scan_bench_")
+        started = time.perf_counter()
+        created = make_tree(root, args.files, args.per_dir)
+        print(f"Создано {created} файлов в {root} за {time.perf_counter() - started:.1f} s")
+
+    if args.latency_ms:
+        add_listing_latency(args.latency_ms / 1000.0)
+
+    parallel = functools.partial(iter_image_files_parallel, workers=args.scan_workers)
+    ordered = functools.partial(iter_image_files_parallel, workers=args.scan_workers, ordered=True)
+    try:
+        baseline = measure("walk+stat", scan_walk_then_stat, root, args.repeats)
+        streaming = measure("scandir", scan_streaming, root, args.repeats)
+        print(f"Ускорение полного прохода: x{baseline / streaming:.2f}")
+        for name, scan in ((f"parallel×{args.scan_workers}", parallel), ("ordered", ordered)):
+            elapsed = measure(name, functools.partial(scan_streaming, scan=scan), root, args.repeats)
+            print(f"  против walk+stat: x{baseline / elapsed:.2f}")
+    finally:
+        if cleanup:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
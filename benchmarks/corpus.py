@@ -0,0 +1,95 @@
+"""Синтетический корпус изображений для бенчмарков: разные размеры, форматы и испорченные файлы.
+
+Корпус детерминирован (--seed): одинаковые параметры дают побайтово одинаковые файлы,
+поэтому результаты разных веток и машин сравнимы. Создаётся один раз и переиспользуется.
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from result_cache import CACHE_DIR
+
+CORPUS_DIR = os.path.join(CACHE_DIR, "bench_corpus")
+CORPUS_VERSION = 1  # менять при изменении состава корпуса: старые корпуса пересоздадутся
+
+# (доля файлов, вид, формат файла, расширение, размер); доли в сумме дают 1
+CORPUS_MIX = (
+    (0.35, "photo", "JPEG", ".jpg", (1920, 1080)),
+    (0.15, "photo", "JPEG", ".jpg", (4000, 3000)),
+    (0.15, "photo", "JPEG", ".jpg", (640, 480)),
+    (0.10, "photo", "PNG", ".png", (800, 600)),
+    (0.05, "photo", "GIF", ".gif", (480, 360)),
+    (0.05, "photo", "BMP", ".bmp", (640, 480)),
+    (0.04, "photo", "PNG", ".jpg", (1024, 768)),  # PNG с расширением .jpg
+    (0.03, "photo", "WEBP", ".jpg", (1024, 768)),  # WebP с расширением .jpg
+    (0.03, "truncated", "JPEG", ".jpg", (1920, 1080)),  # оборванная запись
+    (0.03, "text", None, ".png", None),  # не изображение
+    (0.02, "empty", None, ".jpg", None),  # файл нулевой длины
+)
+
+
+def synthetic_photo(rng, size):
+    """Плавные градиенты и немного шума — по сжатию похоже на снимок камеры"""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    freq = rng.uniform(2, 12, 3) / max(width, height)
+    channels = [127 + 100 * np.sin(x * freq[c] + y * freq[(c + 1) % 3] + phase[c]) for c in range(3)]
+    pixels = np.stack(channels, axis=-1) + rng.normal(0, 4, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def write_file(path, kind, image_format, size, rng):
+    if kind == "empty":
+        open(path, "wb").close()
+    elif kind == "text":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("это не изображение\n" * int(rng.integers(1, 50)))
+    else:
+        img = synthetic_photo(rng, size)
+        if image_format == "GIF":
+            img = img.convert("P", palette=Image.ADAPTIVE)
+        img.save(path, format=image_format, **({"quality": 90} if image_format in ("JPEG", "WEBP") else {}))
+        if kind == "truncated":
+            with open(path, "r+b") as f:
+                f.truncate(os.path.getsize(path) // 2)
+
+
+def corpus_kinds(files):
+    """[(вид, формат, расширение, размер)] на files файлов в пропорциях CORPUS_MIX"""
+    kinds = []
+    for share, *kind in CORPUS_MIX:
+        kinds.extend([tuple(kind)] * max(1, round(files * share)))
+    return kinds[:files]
+
+
+def make_corpus(files, seed=0, root=None, per_dir=100, log=print):
+    """Папка корпуса (создаётся при первом вызове с этими параметрами) и его описание"""
+    root = root or os.path.join(CORPUS_DIR, f"v{CORPUS_VERSION}-{files}-seed{seed}")
+    manifest_path = os.path.join(root, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            return root, json.load(f)
+
+    rng = np.random.default_rng(seed)
+    kinds = corpus_kinds(files)
+    order = rng.permutation(len(kinds))  # форматы и размеры вперемешку, как в настоящих папках
+    counts = {}
+    log(f"Создание корпуса из {len(kinds)} файлов в {root}...")
+    for index, kind_index in enumerate(order):
+        kind, image_format, extension, size = kinds[kind_index]
+        directory = os.path.join(root, f"d{index // per_dir:04d}")
+        os.makedirs(directory, exist_ok=True)
+        write_file(os.path.join(directory, f"img_{index:06d}{extension}"), kind, image_format, size, rng)
+        label = f"{kind}:{image_format or '-'}{extension}" + (f":{size[0]}x{size[1]}" if size else "")
+        counts[label] = counts.get(label, 0) + 1
+
+    manifest = {"version": CORPUS_VERSION, "files": len(kinds), "seed": seed, "kinds": counts,
+                "bytes": sum(os.path.getsize(os.path.join(d, name))
+                             for d, _, names in os.walk(root) for name in names)}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return root, manifest
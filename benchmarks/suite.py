@@ -0,0 +1,286 @@
+"""Набор бенчмарков сканирования и анализа: python -m benchmarks.suite --models pipeline,yahoo --workers 2,8
+
+Корпус — benchmarks.corpus (JPEG разных размеров, PNG, GIF, BMP, файлы с чужим расширением,
+оборванные и пустые файлы). Каждый сценарий запускается в отдельном процессе, чтобы пик памяти (RSS)
+и загрузка модели одного сценария не влияли на другой. Сценарии:
+
+scan                — scanner.iter_image_files / iter_image_files_parallel по корпусу;
+<модель> <режим> w= b= — analyzer.run_analysis без кэша результатов с заданными числом потоков
+                      (или процессов) и размером батча. Модель pipeline — без TensorFlow: настоящее
+                      декодирование и батчинг, вместо сети — среднее по пикселям (издержки конвейера).
+
+Результаты: изобр./с, задержка на файл p50/p95/p99 (от начала декодирования до результата),
+пик RSS, время загрузки модели, время стадий (stage_timing). Пишутся в JSON (--out), --compare печатает изменение
+относительно прошлого файла результатов.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import make_corpus
+from result_cache import CACHE_DIR
+
+RESULTS_DIR = os.path.join(CACHE_DIR, "bench_results")
+PIPELINE_MODEL = "pipeline"
+
+
+def peak_rss():
+    """Пик резидентной памяти текущего процесса в байтах; None, если узнать нельзя"""
+    try:
+        # VmHWM сбрасывается при exec, а ru_maxrss в Linux наследует пик родительского процесса
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # macOS — байты, Linux — КБ
+    except ImportError:
+        pass
+    try:
+        import psutil  # Windows
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def percentiles(values, points=(50, 95, 99)):
+    if not values:
+        return {f"p{p}_ms": None for p in points}
+    values = sorted(values)
+    return {f"p{p}_ms": round(values[min(len(values) - 1, int(len(values) * p / 100))], 3) for p in points}
+
+
+# ---------------------- СЦЕНАРИЙ (в отдельном процессе) ----------------------
+def run_scan_scenario(scenario):
+    from scanner import iter_image_files, iter_image_files_parallel
+
+    workers = scenario["workers"]
+    started = time.perf_counter()
+    if workers > 1:
+        rows = sum(1 for _ in iter_image_files_parallel(scenario["corpus"], workers))
+    else:
+        rows = sum(1 for _ in iter_image_files(scenario["corpus"]))
+    elapsed = time.perf_counter() - started
+    return {"files": rows, "elapsed_s": elapsed, "per_second": rows / elapsed if elapsed else None}
+
+
+def initialize_pipeline_model(ctx):
+    """Вместо сети — среднее по пикселям: измеряется только конвейер (чтение, декодирование, батчи)"""
+    from preprocessing import PREPROCESS_VERSION, YAHOO_SPEC, make_loader
+
+    ctx.model_name = PIPELINE_MODEL
+    ctx.model_version = f"{PIPELINE_MODEL}+{PREPROCESS_VERSION}"
+    ctx.input_spec = YAHOO_SPEC
+    ctx.load_fn = make_loader(YAHOO_SPEC, ctx.jpeg_draft)
+    ctx.predict_batch_fn = lambda batch: [(float(tensor.mean()) / 255.0, None) for tensor in batch]
+
+
+def run_analysis_scenario(scenario):
+    from analyzer import initialize_model, run_analysis
+    from cli import HeadlessContext, build_parser
+    from scanner import iter_image_files
+
+    timings_path = os.path.join(os.path.dirname(scenario["result"]), "stages.json")
+    argv = ["scan", scenario["corpus"], "--model", scenario["model"], "--no-cache", "--timings", timings_path,
+            "--workers", str(scenario["workers"]), "--batch-size", str(scenario["batch_size"])]
+    if not scenario.get("draft", True):
+        argv.append("--full-decode")
+    ctx = HeadlessContext(build_parser().parse_args(argv))
+    paths = []
+    for img_path, size, mtime_ns, _ in iter_image_files(scenario["corpus"]):
+        paths.append(img_path)
+        ctx.file_stats[img_path] = (size, mtime_ns)
+
+    started = time.perf_counter()
+    if scenario["model"] == PIPELINE_MODEL:
+        initialize_pipeline_model(ctx)
+    else:
+        initialize_model(ctx, scenario["model"])
+    load_seconds = time.perf_counter() - started
+    if ctx.predict_batch_fn is None:
+        raise ValueError(f"модель {scenario['model']} не инициализирована")
+
+    latencies = []
+    errors = []
+
+    def on_item(item, img_path, result, error, source, elapsed_ms):
+        if error is not None:
+            errors.append(img_path)
+        elif elapsed_ms is not None:
+            latencies.append(elapsed_ms)
+
+    started = time.perf_counter()
+    stats = run_analysis(ctx, [(path, path) for path in paths], 0.7, on_item, execution_mode=scenario["mode"],
+                         quiet=True)
+    elapsed = time.perf_counter() - started
+    result = {"files": len(paths), "analyzed": len(latencies), "errors": len(errors), "elapsed_s": elapsed,
+              "per_second": stats["processed"] / elapsed if elapsed else None, "model_load_s": load_seconds}
+    result.update(percentiles(latencies))
+    with open(timings_path, encoding="utf-8") as f:
+        result["stages"] = json.load(f)["stages"]  # p50/p95/p99 по стадиям (stage_timing)
+    return result
+
+
+def run_scenario_here(scenario_path, result_path):
+    """Точка входа процесса сценария: читает сценарий из JSON, пишет результат в JSON"""
+    from log_writer import LOG_WRITER
+
+    with open(scenario_path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    scenario["result"] = result_path
+    LOG_WRITER.path = os.path.join(os.path.dirname(result_path), "analyzer.log")  # не засоряем лог приложения
+    try:
+        run = run_scan_scenario if scenario["kind"] == "scan" else run_analysis_scenario
+        result = run(scenario)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    result["peak_rss"] = peak_rss()
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+# ---------------------- ОРКЕСТРАЦИЯ ----------------------
+def scenario_name(scenario):
+    if scenario["kind"] == "scan":
+        return f"scan w={scenario['workers']}"
+    draft = "" if scenario.get("draft", True) else " full-decode"
+    return f"{scenario['model']} {scenario['mode']} w={scenario['workers']} b={scenario['batch_size']}{draft}"
+
+
+def run_scenario(scenario, folder, verbose=False):
+    """Запускает сценарий в новом процессе python -m benchmarks.suite --run-scenario"""
+    scenario_path = os.path.join(folder, "scenario.json")
+    result_path = os.path.join(folder, "result.json")
+    with open(scenario_path, "w", encoding="utf-8") as f:
+        json.dump(scenario, f)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = None if verbose else subprocess.DEVNULL
+    subprocess.run([sys.executable, "-m", "benchmarks.suite", "--run-scenario", scenario_path, result_path],
+                   cwd=repo_root, stdout=output, stderr=output, check=False)
+    if not os.path.exists(result_path):
+        return {"error": "процесс сценария завершился без результата (--verbose покажет вывод)"}
+    with open(result_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def best_of(results):
+    """Из повторов берётся самый быстрый; пик памяти — наибольший"""
+    ok = [result for result in results if "error" not in result]
+    if not ok:
+        return results[0]
+    best = dict(max(ok, key=lambda result: result.get("per_second") or 0))
+    rss = [result["peak_rss"] for result in ok if result.get("peak_rss")]
+    best["peak_rss"] = max(rss) if rss else None
+    best["repeats"] = len(ok)
+    return best
+
+
+def build_scenarios(args, corpus):
+    scenarios = [{"kind": "scan", "corpus": corpus, "workers": workers} for workers in sorted({1, *args.workers})]
+    for model in args.models:
+        for mode in args.modes:
+            if mode == "processes" and model == PIPELINE_MODEL:
+                continue  # процессы пула загружают модель по имени через initialize_model
+            for workers in args.workers:
+                for batch_size in args.batch_sizes:
+                    scenarios.append({"kind": "analysis", "corpus": corpus, "model": model, "mode": mode,
+                                      "workers": workers, "batch_size": batch_size, "draft": not args.full_decode})
+    return scenarios
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_row(name, result, previous=None):
+    if "error" in result:
+        return f"{name:<42} ❌ {result['error']}"
+    rss = f"{result['peak_rss'] / 2 ** 20:7.0f} МБ" if result.get("peak_rss") else "      ?"
+    latency = "".join(f"{result[key]:9.1f}" if result.get(key) is not None else "        —"
+                      for key in ("p50_ms", "p95_ms", "p99_ms"))
+    line = f"{name:<42} {result['per_second']:9.1f}{latency}  {rss}"
+    if previous and previous.get("per_second") and "error" not in previous:
+        line += f"  {result['per_second'] / previous['per_second'] - 1:+.0%}"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки сканирования и анализа на синтетическом корпусе")
+    parser.add_argument("--files", type=int, default=300, help="файлов в корпусе")
+    parser.add_argument("--seed", type=int, default=0, help="seed корпуса")
+    parser.add_argument("--corpus", default=None, help="папка корпуса (по умолчанию ~/.nsfw_analyzer/bench_corpus)")
+    parser.add_argument("--models", default=PIPELINE_MODEL,
+                        help=f"модели через запятую: {PIPELINE_MODEL} (без TensorFlow), yahoo, gantman, ...")
+    parser.add_argument("--modes", default="threads", help="threads, processes или оба через запятую")
+    parser.add_argument("--workers", default="4", help="потоков декодирования (процессов) через запятую")
+    parser.add_argument("--batch-sizes", default="32", help="размеры батча через запятую")
+    parser.add_argument("--full-decode", action="store_true", help="JPEG в полном разрешении")
+    parser.add_argument("--repeats", type=int, default=1, help="повторов каждого сценария, берётся лучший")
+    parser.add_argument("--out", default=None,
+                        help="файл результатов JSON (по умолчанию ~/.nsfw_analyzer/bench_results)")
+    parser.add_argument("--compare", default=None, help="прошлый файл результатов для сравнения")
+    parser.add_argument("--verbose", action="store_true", help="показывать вывод процессов сценариев")
+    parser.add_argument("--run-scenario", nargs=2, metavar=("SCENARIO", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_scenario:
+        run_scenario_here(*args.run_scenario)
+        return
+
+    args.models = [name.strip() for name in args.models.split(",") if name.strip()]
+    args.modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    args.workers = [int(value) for value in args.workers.split(",")]
+    args.batch_sizes = [int(value) for value in args.batch_sizes.split(",")]
+
+    from utils import get_cpu_cores
+
+    corpus, manifest = make_corpus(args.files, args.seed, args.corpus)
+    print(f"Корпус: {corpus} ({manifest['files']} файлов, {manifest['bytes'] / 2 ** 20:.0f} МБ)")
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = {entry["name"]: entry for entry in json.load(f)["scenarios"]}
+
+    print(f"{'сценарий':<42} {'изобр./с':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  {'пик RSS':>10}")
+    scenarios = []
+    with tempfile.TemporaryDirectory(prefix="nsfw_bench_suite_") as folder:
+        for scenario in build_scenarios(args, corpus):
+            name = scenario_name(scenario)
+            result = best_of([run_scenario(scenario, folder, args.verbose) for _ in range(max(1, args.repeats))])
+            print(format_row(name, result, previous.get(name)))
+            scenarios.append({"name": name, "scenario": scenario, **result})
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_cores": get_cpu_cores(),
+        "corpus": {key: manifest[key] for key in ("version", "files", "seed", "bytes")},
+        "scenarios": scenarios,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['git'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {out}")
+
+
+if __name__ == "__main__":
+    main()
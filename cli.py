@@ -0,0 +1,293 @@
+"""Консольный режим без Tk: nsfw-analyzer scan <папка> --out results.jsonl"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+from batching import BATCH_MAX_WAIT, BATCH_SIZE
+from ensemble import CASCADE_BAND, COMBINERS, DEFAULT_COMBINER, check_weights, is_ensemble, member_names
+from process_pool import WorkerContext
+from scanner import ScanStats, iter_image_files, iter_image_files_parallel
+from snapshot import save_folder_snapshot, start_snapshot_diff
+from utils import log_message
+
+PROGRESS_EVERY = 500  # как часто печатать прогресс в stderr
+FLUSH_EVERY = 100  # как часто сбрасывать results.jsonl на диск
+
+
+class HeadlessContext(WorkerContext):
+    """Те же атрибуты, что analyze_images ожидает от NSFWAnalyzerApp, но без виджетов"""
+
+    def __init__(self, args):
+        super().__init__()
+        self.image_queue = None  # логи идут сразу в log_message
+        self.stop_analysis = False
+        self.running = True
+        self.file_stats = {}
+
+        self.batch_size = args.batch_size
+        self.batch_max_wait = BATCH_MAX_WAIT
+        self.prefetch_size = None
+        self.decode_workers = args.workers
+        self.execution_mode = "processes" if getattr(args, "processes", False) else "threads"
+        self.process_workers = args.workers
+        self.use_cache = not args.no_cache
+        self.cache_path = None
+        self.result_cache = None
+        self.use_dedup = not args.no_dedup
+        self.incremental = getattr(args, "changed_only", False)
+        self.snapshot_path = None
+        self.jpeg_draft = not args.full_decode
+        self.ensemble_combiner = args.combine
+        self.ensemble_weights = [float(w) for w in args.weights.split(",")] if args.weights else None
+        self.cascade_band = args.band
+        self.timings_path = args.timings
+        self.autotune = not args.no_autotune
+
+
+class JsonlWriter:
+    """Потокобезопасная запись результатов по мере готовности, по одной JSON-строке на файл"""
+
+    def __init__(self, path, total, threshold, mode="w"):
+        self.file = open(path, mode, encoding="utf-8")
+        self.lock = threading.Lock()
+        self.total = total
+        self.threshold = threshold
+        self.count = 0
+
+    def write(self, item, img_path, result, error, source, elapsed_ms):
+        record = {"path": img_path, "source": source}
+        if error is not None:
+            record.update(status="bad", score=None, label=None, nsfw=None, error=str(error))
+        else:
+            score, label = result[:2]
+            nsfw = None if label is not None else score >= self.threshold
+            status = "label" if label is not None else ("nsfw" if nsfw else "safe")
+            record.update(status=status, score=round(float(score), 6), label=label, nsfw=nsfw, error=None)
+            if len(result) > 2:
+                record["models"] = {name: round(float(value), 6) for name, value in result[2].items()}
+        if elapsed_ms is not None:
+            record["elapsed_ms"] = round(elapsed_ms, 1)
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.count += 1
+            if self.count % FLUSH_EVERY == 0:
+                self.file.flush()
+            if self.count % PROGRESS_EVERY == 0 or self.count == self.total:
+                print(f"… {self.count} / {self.total}", file=sys.stderr)
+
+    def write_removed(self, img_path):
+        """Файл был в прошлом снимке папки, но больше не найден (--changed-only)"""
+        record = {"path": img_path, "source": "snapshot", "status": "removed",
+                  "score": None, "label": None, "nsfw": None, "error": None}
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nsfw-analyzer", description="NSFW Analyzer Pro — консольный режим")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Общие параметры scan и watch
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("folder", help="папка с изображениями (рекурсивно)")
+    common.add_argument("--model", default="yahoo",
+                        help="модель: yahoo, mobilenet, gantman, nsfw hub, tf hub (по умолчанию yahoo); "
+                             "несколько через + — ансамбль (yahoo+gantman), через > — каскад "
+                             "('yahoo>gantman' — в кавычках, иначе оболочка примет > за перенаправление)")
+    common.add_argument("--combine", choices=COMBINERS, default=DEFAULT_COMBINER,
+                        help="объединение оценок ансамбля (по умолчанию max)")
+    common.add_argument("--weights", default=None, help="веса моделей для --combine weighted, например 0.7,0.3")
+    common.add_argument("--band", type=float, default=CASCADE_BAND,
+                        help="каскад: вторая модель проверяет оценки в пределах порог ± band (по умолчанию 0.15)")
+    common.add_argument("--threshold", type=float, default=0.7, help="порог НЮ для бинарных моделей")
+    common.add_argument("--workers", type=int, default=None,
+                        help="потоков декодирования (или процессов с --processes)")
+    common.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="размер батча инференса")
+    common.add_argument("--no-autotune", action="store_true",
+                        help="не подбирать потоки и батч на первых изображениях (без --workers, от 5000 файлов)")
+    common.add_argument("--no-cache", action="store_true", help="не использовать кэш результатов")
+    common.add_argument("--no-dedup", action="store_true", help="не искать побайтовые дубликаты")
+    common.add_argument("--full-decode", action="store_true",
+                        help="декодировать JPEG в полном разрешении (по умолчанию — сразу уменьшенным)")
+    common.add_argument("--out", default="results.jsonl", help="файл результатов (JSON Lines)")
+    common.add_argument("--timings", default=None,
+                        help="записать время стадий (p50/p95/p99 чтения, декодирования, инференса...) в JSON")
+
+    scan = commands.add_parser("scan", parents=[common], help="просканировать папку и записать результаты в JSONL")
+    scan.add_argument("--processes", action="store_true", help="инференс в пуле процессов")
+    scan.add_argument("--scan-workers", type=int, default=1,
+                      help="потоков обхода папок (>1 — параллельный листинг для сетевых дисков)")
+    scan.add_argument("--ordered", action="store_true",
+                      help="при параллельном обходе выдавать файлы в детерминированном порядке")
+    scan.add_argument("--changed-only", action="store_true",
+                      help="анализировать только изменения с прошлого запуска (снимок папки)")
+
+    watch = commands.add_parser("watch", parents=[common],
+                                help="анализировать новые файлы в папке по мере появления (до Ctrl+C)")
+    watch.add_argument("--settle", type=float, default=None,
+                       help="файл готов, если не менялся столько секунд (по умолчанию 1.0)")
+    watch.add_argument("--poll", action="store_true", help="опрашивать папку вместо inotify")
+    return parser
+
+
+def run_scan(args):
+    if not os.path.isdir(args.folder):
+        print(f"❌ Папка не найдена: {args.folder}", file=sys.stderr)
+        return 2
+
+    from analyzer import format_report, initialize_model, open_result_cache, run_analysis
+
+    ctx = HeadlessContext(args)
+    log_message(f"Сканирование {args.folder}...\n")
+    scan_stats = ScanStats()
+    diff = start_snapshot_diff(ctx, args.folder)
+    all_entries = []  # для нового снимка папки
+    paths = []
+    if args.scan_workers > 1:
+        entries = iter_image_files_parallel(args.folder, args.scan_workers, scan_stats, ordered=args.ordered)
+    else:
+        entries = iter_image_files(args.folder, scan_stats)
+    for entry in entries:
+        img_path, size, mtime_ns, _ = entry
+        paths.append(img_path)
+        ctx.file_stats[img_path] = (size, mtime_ns)
+        if diff is not None:
+            diff.add(entry)
+            all_entries.append(entry)
+    log_message(f"Найдено {len(paths)} изображений (недоступно: {scan_stats.errors})\n")
+
+    if diff is not None:
+        diff.finish()
+        log_message(diff.summary())
+        changed = diff.changed_paths()
+        paths = [img_path for img_path in paths if img_path in changed]
+
+    initialize_model(ctx, args.model)
+    if ctx.predict_batch_fn is None:
+        return 2
+
+    writer = JsonlWriter(args.out, len(paths), args.threshold)
+    if diff is not None:
+        cache = open_result_cache(ctx)
+        if diff.moved and cache is not None:
+            cache.rename_many(diff.moved)  # перемещённые возьмут результат из кэша
+        for img_path in diff.removed:
+            writer.write_removed(img_path)
+    jobs = [(img_path, img_path) for img_path in paths]
+    outcome = {}
+
+    def analyze():
+        try:
+            outcome["stats"] = run_analysis(ctx, jobs, args.threshold, writer.write)
+        except Exception as e:
+            outcome["error"] = e
+
+    # Анализ в отдельном потоке, чтобы Ctrl+C в главном потоке мог корректно его остановить
+    worker = threading.Thread(target=analyze, daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        log_message("⛔ Остановка по Ctrl+C, дожидаемся текущих батчей...\n")
+        ctx.stop_analysis = True
+        worker.join()
+    finally:
+        writer.close()
+        if ctx.result_cache is not None:
+            ctx.result_cache.close()
+
+    if diff is not None and "stats" in outcome and not ctx.stop_analysis:
+        save_folder_snapshot(ctx, args.folder, all_entries)
+    if "stats" in outcome:
+        log_message(format_report(outcome["stats"]))
+    elif not ctx.stop_analysis:
+        log_message(f"❌ Анализ прерван: {outcome.get('error')}\n")
+    log_message(f"💾 Результаты записаны в {args.out}\n")
+    if ctx.stop_analysis:
+        return 130
+    return 0 if "stats" in outcome else 1  # анализ упал — для cron это не успешный прогон
+
+
+def run_watch(args):
+    if not os.path.isdir(args.folder):
+        print(f"❌ Папка не найдена: {args.folder}", file=sys.stderr)
+        return 2
+
+    from analyzer import initialize_model
+    from watcher import watch_folder
+
+    ctx = HeadlessContext(args)
+    if args.settle is not None:
+        ctx.watch_settle = args.settle
+    ctx.watch_inotify = not args.poll
+    initialize_model(ctx, args.model)
+    if ctx.predict_batch_fn is None:
+        return 2
+
+    writer = JsonlWriter(args.out, None, args.threshold, mode="a")  # дописываем: наблюдение может перезапускаться
+
+    def add_entries(entries):
+        for img_path, size, mtime_ns, _ in entries:
+            ctx.file_stats[img_path] = (size, mtime_ns)
+        return [(img_path, img_path) for img_path, _, _, _ in entries]
+
+    def should_stop():
+        return ctx.stop_analysis
+
+    outcome = {}
+    finished = threading.Event()
+
+    def watch():
+        try:
+            outcome["analyzed"] = watch_folder(ctx, args.folder, args.threshold, writer.write, add_entries,
+                                               should_stop)
+        finally:
+            finished.set()
+
+    # Ждём через Event, а не Thread.join: прерванный Ctrl+C join может вернуться раньше конца потока
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        while not finished.wait(timeout=0.5):
+            pass
+    except KeyboardInterrupt:
+        log_message("⛔ Остановка наблюдения по Ctrl+C...\n")
+        ctx.stop_analysis = True
+        finished.wait()
+    finally:
+        writer.close()
+        if ctx.result_cache is not None:
+            ctx.result_cache.close()
+
+    log_message(f"👁 Проанализировано {outcome.get('analyzed', 0)} файлов, результаты в {args.out}\n")
+    return 130 if ctx.stop_analysis else 1
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.weights:
+        try:
+            weights = [float(w) for w in args.weights.split(",")]
+            if is_ensemble(args.model):
+                check_weights(weights, len(member_names(args.model)))
+        except ValueError as e:
+            parser.error(f"--weights: {e}")
+    if args.command == "scan":
+        return run_scan(args)
+    if args.command == "watch":
+        return run_watch(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
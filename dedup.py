@@ -0,0 +1,67 @@
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+PREFIX_BYTES = 64 * 1024  # первый проход: хэш начала файла
+CHUNK_BYTES = 1024 * 1024
+
+
+def hash_file(path, limit=None):
+    """blake2b содержимого файла (или первых limit байт)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        if limit is not None:
+            digest.update(f.read(limit))
+        else:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _regroup(groups, key_fn, workers, should_stop):
+    """Разбивает группы путей по key_fn(path); оставляет только группы из 2+ файлов"""
+    paths = [path for group in groups for path in group]
+
+    def safe_key(path):
+        if should_stop():
+            return None
+        try:
+            return key_fn(path)
+        except OSError:
+            return None  # нечитаемый файл — пусть его обработает анализ (BAD)
+
+    regrouped = defaultdict(list)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as executor:
+        for path, key in zip(paths, executor.map(safe_key, paths)):
+            if key is not None:
+                regrouped[key].append(path)
+    return [group for group in regrouped.values() if len(group) > 1]
+
+
+def find_duplicates(sizes, workers=8, should_stop=lambda: False):
+    """Ищет побайтно одинаковые файлы.
+
+    sizes — dict путь -> размер в порядке сканирования. Хэшируются только файлы с совпадающим размером:
+    сначала первые PREFIX_BYTES, затем целиком — только то, что совпало и по началу.
+    Возвращает (dict дубликат -> оригинал, число прочитанных для хэша файлов);
+    оригиналом считается первый файл группы в порядке сканирования.
+    """
+    by_size = defaultdict(list)
+    for path, size in sizes.items():
+        by_size[size].append(path)
+    groups = [group for group in by_size.values() if len(group) > 1]
+    hashed = sum(len(group) for group in groups)
+
+    groups = _regroup(groups, lambda p: (sizes[p], hash_file(p, PREFIX_BYTES)), workers, should_stop)
+
+    # Файлы не длиннее префикса уже сравнены целиком
+    small = [group for group in groups if sizes[group[0]] <= PREFIX_BYTES]
+    large = [group for group in groups if sizes[group[0]] > PREFIX_BYTES]
+    groups = small + _regroup(large, lambda p: (sizes[p], hash_file(p)), workers, should_stop)
+
+    duplicates = {}
+    for group in groups:
+        original = group[0]
+        for path in group[1:]:
+            duplicates[path] = original
+    return duplicates, hashed
@@ -0,0 +1,167 @@
+import numpy as np
+
+from model_registry import MODEL_CACHE_MB
+from preprocessing import load_many
+from process_pool import WorkerContext
+from utils import log_message
+
+ENSEMBLE_SEPARATOR = "+"  # "yahoo nsfw + gantman nsfw" — ансамбль из двух моделей
+COMBINERS = ("max", "mean", "weighted", "vote")
+DEFAULT_COMBINER = "max"
+
+CASCADE_SEPARATOR = ">"  # "yahoo nsfw > gantman nsfw" — каскад: быстрая модель, затем точная
+CASCADE_BAND = 0.15  # вторая модель проверяет только оценки в пределах порог ± band
+
+
+def is_ensemble(model_name):
+    return ENSEMBLE_SEPARATOR in model_name
+
+
+def is_cascade(model_name):
+    return CASCADE_SEPARATOR in model_name
+
+
+def member_names(model_name, separator=ENSEMBLE_SEPARATOR):
+    return [name.strip() for name in model_name.split(separator) if name.strip()]
+
+
+def combine(scores, combiner, weights=None, threshold=0.5):
+    """Итоговая оценка ансамбля по оценкам NSFW отдельных моделей (список в порядке моделей).
+
+    max      — самая строгая модель (файл помечается, если его пометила хотя бы одна);
+    mean     — среднее;
+    weighted — среднее с весами weights (по умолчанию равными);
+    vote     — доля моделей с оценкой не ниже threshold: при том же пороге
+               вердикт НЮ означает, что «за» проголосовала не меньшая доля моделей.
+    """
+    if combiner == "max":
+        return max(scores)
+    if combiner == "mean":
+        return sum(scores) / len(scores)
+    if combiner == "weighted":
+        weights = weights or [1.0] * len(scores)
+        return sum(w * s for w, s in zip(weights, scores)) / sum(weights)
+    if combiner == "vote":
+        return sum(1 for s in scores if s >= threshold) / len(scores)
+    raise ValueError(f"неизвестный способ объединения: {combiner}")
+
+
+def check_weights(weights, count):
+    """Веса для "weighted": по одному на модель, неотрицательные, с положительной суммой (делитель среднего)"""
+    if len(weights) != count:
+        raise ValueError(f"весов {len(weights)}, а моделей в ансамбле {count}")
+    if any(w < 0 for w in weights) or sum(weights) <= 0:
+        raise ValueError(f"веса должны быть неотрицательными, а их сумма — больше нуля: {weights}")
+
+
+def cache_version(self, threshold):
+    """Версия для ключа кэша результатов. Оценка голосования и выбор файлов для второй модели
+    каскада зависят от порога, поэтому при threshold_in_version порог входит в версию:
+    после смены порога кэш не используется."""
+    version = getattr(self, "model_version", "")
+    if getattr(self, "threshold_in_version", False):
+        version += f" | порог {threshold:g}"
+    return version
+
+
+def initialize_ensemble(self, model_name, initialize_model):
+    """Загружает все модели ансамбля сразу и собирает общие load_fn / predict_batch_fn.
+
+    Файл декодируется один раз (preprocessing.load_many), load_fn отдаёт массив (моделей, 224, 224, 3),
+    и BatchInferencer складывает такие массивы в батч (N, моделей, 224, 224, 3): каждая модель получает
+    свой срез батча. Результат — (итоговая оценка, None, {модель: оценка}).
+    """
+    combiner = getattr(self, "ensemble_combiner", DEFAULT_COMBINER)
+    weights = getattr(self, "ensemble_weights", None)
+    if combiner not in COMBINERS:
+        raise ValueError(f"неизвестный способ объединения: {combiner} (доступны: {', '.join(COMBINERS)})")
+    if weights is not None:
+        check_weights(weights, len(member_names(model_name)))  # до загрузки моделей
+
+    members = load_members(self, member_names(model_name), initialize_model)
+
+    names = [member.model_name for member in members]
+
+    def ensemble_predict_batch(batch):
+        per_model = [member.nsfw_batch_fn(batch[:, index]) for index, member in enumerate(members)]
+        threshold = getattr(self, "score_threshold", 0.5)
+        results = []
+        for scores in zip(*per_model):
+            results.append((combine(scores, combiner, weights, threshold), None, dict(zip(names, scores))))
+        return results
+
+    use_members(self, members, " + ", f"{combiner}{weights or ''}")
+    self.threshold_in_version = combiner == "vote"
+    self.predict_batch_fn = ensemble_predict_batch
+    log_message(f"🧩 Ансамбль готов: {', '.join(names)} | объединение: {combiner}"
+                f"{f' {weights}' if weights else ''}\n", self.log_console)
+
+
+def initialize_cascade(self, model_name, initialize_model):
+    """Каскад из двух моделей: быстрая оценивает все файлы, точная — только неуверенные.
+
+    Неуверенные — с оценкой быстрой модели в пределах порог ± cascade_band; итог для них даёт
+    вторая модель. Обе модели получают вход из одного декодирования, вторая прогоняется
+    батчем из неуверенных изображений того же батча.
+    Результат — (итоговая оценка, None, {модель: оценка}) только с реально запущенными моделями.
+    """
+    band = getattr(self, "cascade_band", CASCADE_BAND)
+    members = load_members(self, member_names(model_name, CASCADE_SEPARATOR), initialize_model)
+    if len(members) != 2:
+        raise ValueError(f"каскад задаётся двумя моделями «быстрая > точная», а не {len(members)}")
+    fast, slow = members
+
+    def cascade_predict_batch(batch):
+        threshold = getattr(self, "score_threshold", 0.5)
+        fast_scores = fast.nsfw_batch_fn(batch[:, 0])
+        uncertain = [index for index, score in enumerate(fast_scores) if abs(score - threshold) <= band]
+        slow_scores = dict(zip(uncertain, slow.nsfw_batch_fn(batch[uncertain, 1]))) if uncertain else {}
+        results = []
+        for index, score in enumerate(fast_scores):
+            if index in slow_scores:
+                slow_score = slow_scores[index]
+                results.append((slow_score, None, {fast.model_name: score, slow.model_name: slow_score}))
+            else:
+                results.append((score, None, {fast.model_name: score}))
+        return results
+
+    use_members(self, members, " > ", f"±{band}")
+    self.threshold_in_version = True  # какие файлы уходят точной модели, решает abs(оценка - порог) <= band
+    self.predict_batch_fn = cascade_predict_batch
+    log_message(f"🪜 Каскад готов: {fast.model_name} → {slow.model_name} для оценок в пределах порог ±{band}\n",
+                self.log_console)
+
+
+def load_members(self, names, initialize_model):
+    """Загружает модели ансамбля или каскада; у каждой должна быть оценка NSFW (nsfw_batch_fn)"""
+    members = []
+    for name in names:
+        member = WorkerContext()
+        member.log_console = self.log_console
+        member.jpeg_draft = getattr(self, "jpeg_draft", True)
+        member.model_cache_mb = getattr(self, "model_cache_mb", MODEL_CACHE_MB)
+        initialize_model(member, name)
+        if member.nsfw_batch_fn is None:
+            raise ValueError(f"модель {name} не даёт оценку NSFW и не может входить в ансамбль или каскад")
+        members.append(member)
+    return members
+
+
+def use_members(self, members, separator, settings):
+    """Общий вход для нескольких моделей: файл декодируется один раз, load_fn отдаёт (моделей, 224, 224, 3).
+
+    Версия (ключ кэша) собирается из версий моделей и настроек объединения settings.
+    """
+    specs = [member.input_spec for member in members]
+    draft = getattr(self, "jpeg_draft", True)
+
+    def members_load(img_path, timings=None):
+        return np.stack(load_many(img_path, specs, draft, timings))
+
+    self.ensemble_members = members
+    self.model = [member.model for member in members]
+    self.model_version = (separator.join(f"{member.model_name}={member.model_version}" for member in members)
+                          + f" | {settings}")
+    self.input_spec = None
+    self.load_fn = members_load
+    self.nsfw_batch_fn = None
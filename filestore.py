@@ -0,0 +1,179 @@
+import datetime
+import math
+import os
+import sys
+import threading
+from array import array
+
+from utils import convert_size
+
+# Столбцы таблицы результатов (порядок значений в FileStore.render)
+COLUMNS = ("#", "Имя файла", "Путь", "Размер", "Дата изменения", "Порог", "Статус")
+
+# Статус -> тег подсветки строки; остальные непустые статусы — метки классов MobileNet / GantMan
+STATUS_TAGS = {"✓": "nude", "✗": "safe", "BAD": "bad", "": None}
+
+# Ключи сортировки по столбцам: функция (store, row_id) -> значение
+SORT_KEYS = {
+    "#": lambda store, row_id: row_id,
+    "Имя файла": lambda store, row_id: os.path.basename(store.paths[row_id]).lower(),
+    "Путь": lambda store, row_id: store.paths[row_id].lower(),
+    "Размер": lambda store, row_id: store.sizes[row_id],
+    "Дата изменения": lambda store, row_id: store.mtimes_ns[row_id],
+    "Порог": lambda store, row_id: -1.0 if math.isnan(store.scores[row_id]) else store.scores[row_id],
+    "Статус": lambda store, row_id: store.statuses[row_id],
+}
+
+
+class FileStore:
+    """Компактное хранилище строк таблицы: столбцы в массивах, строки создаются только для видимого окна.
+
+    row_id — порядковый номер файла при сканировании, не меняется при фильтрации и сортировке.
+    view — row_id строк, прошедших фильтр, в порядке отображения.
+    Удалённые строки остаются «дырками» (путь None), чтобы row_id не сдвигались.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.paths = []
+            self.sizes = array("q")
+            self.mtimes_ns = array("q")
+            self.inodes = array("Q")  # для снимка папки (snapshot.py)
+            self.scores = array("d")  # nan — ещё не анализировался
+            self.statuses = []
+            self.model_scores = {}  # row_id -> {модель: оценка}, только у строк ансамбля и каскада
+            self.index = {}  # путь -> row_id
+            self.view = []
+            self.filter_fn = None  # фильтр по статусу; None — все строки
+            self.sort_column = None
+            self.sort_reverse = False
+
+    def __len__(self):
+        return len(self.index)
+
+    # ---------------------- ДОБАВЛЕНИЕ И ИЗМЕНЕНИЕ ----------------------
+    def add_many(self, entries):
+        """Добавляет файлы [(путь, st_size, st_mtime_ns, inode), ...]; новые строки видны в конце view.
+
+        У уже известных путей (файл перезаписан) обновляются размер, mtime и inode.
+        """
+        with self.lock:
+            for path, size, mtime_ns, inode in entries:
+                row_id = self.index.get(path)
+                if row_id is not None:
+                    self.sizes[row_id] = size
+                    self.mtimes_ns[row_id] = mtime_ns
+                    self.inodes[row_id] = inode
+                    continue
+                row_id = len(self.paths)
+                self.paths.append(path)
+                self.sizes.append(size)
+                self.mtimes_ns.append(mtime_ns)
+                self.inodes.append(inode)
+                self.scores.append(math.nan)
+                self.statuses.append("")
+                self.index[path] = row_id
+                if self.filter_fn is None or self.filter_fn(""):
+                    self.view.append(row_id)
+
+    def get(self, path, default=None):
+        """(st_size, st_mtime_ns) файла — тот же интерфейс, что у словаря file_stats в CLI"""
+        row_id = self.index.get(path)
+        if row_id is None:
+            return default
+        return self.sizes[row_id], self.mtimes_ns[row_id]
+
+    def row_id(self, path):
+        return self.index.get(path)
+
+    def path(self, row_id):
+        return self.paths[row_id]
+
+    def status(self, row_id):
+        return self.statuses[row_id]
+
+    def set_result(self, row_id, score, status, models=None):
+        """models — оценки отдельных моделей ансамбля или каскада"""
+        if self.paths[row_id] is None:
+            return  # строка удалена, пока шёл анализ
+        self.scores[row_id] = score
+        self.statuses[row_id] = sys.intern(status)  # статусов мало — храним одну копию строки
+        if models:
+            self.model_scores[row_id] = models
+        else:
+            self.model_scores.pop(row_id, None)
+
+    def models(self, row_id):
+        return self.model_scores.get(row_id)
+
+    def rename(self, row_id, new_path):
+        with self.lock:
+            self.index.pop(self.paths[row_id], None)
+            self.paths[row_id] = new_path
+            self.index[new_path] = row_id
+
+    def remove(self, row_id):
+        with self.lock:
+            self.index.pop(self.paths[row_id], None)
+            self.paths[row_id] = None
+            try:
+                self.view.remove(row_id)  # O(n), но только при ручном удалении
+            except ValueError:
+                pass
+
+    # ---------------------- ФИЛЬТР И СОРТИРОВКА ----------------------
+    def set_filter(self, filter_fn):
+        """Перестраивает view по фильтру статуса и восстанавливает текущую сортировку"""
+        with self.lock:
+            self.filter_fn = filter_fn
+            statuses = self.statuses
+            if filter_fn is None:
+                self.view = [row_id for row_id, path in enumerate(self.paths) if path is not None]
+            else:
+                self.view = [row_id for row_id, path in enumerate(self.paths)
+                             if path is not None and filter_fn(statuses[row_id])]
+            self._sort_locked()
+
+    def sort(self, column, reverse=False):
+        with self.lock:
+            self.sort_column = column
+            self.sort_reverse = reverse
+            self._sort_locked()
+
+    def _sort_locked(self):
+        key = SORT_KEYS.get(self.sort_column)
+        if key is None:
+            return
+        self.view.sort(key=lambda row_id: key(self, row_id), reverse=self.sort_reverse)
+
+    def jobs(self):
+        """Снимок видимых строк для анализа: [(row_id, путь), ...]"""
+        with self.lock:
+            return [(row_id, self.paths[row_id]) for row_id in self.view]
+
+    def entries(self):
+        """Все строки как записи сканера [(путь, size, mtime_ns, inode), ...] — для снимка папки"""
+        with self.lock:
+            return [(path, self.sizes[row_id], self.mtimes_ns[row_id], self.inodes[row_id])
+                    for row_id, path in enumerate(self.paths) if path is not None]
+
+    # ---------------------- ОТОБРАЖЕНИЕ ----------------------
+    def render(self, row_id):
+        """Значения строки для Treeview и тег подсветки"""
+        path = self.paths[row_id]
+        score = self.scores[row_id]
+        status = self.statuses[row_id]
+        values = (
+            row_id + 1,
+            os.path.basename(path),
+            path,
+            convert_size(self.sizes[row_id]),
+            datetime.datetime.fromtimestamp(self.mtimes_ns[row_id] / 1e9).strftime('%Y-%m-%d %H:%M'),
+            "" if math.isnan(score) else f"{score:.4f}",
+            status,
+        )
+        return values, STATUS_TAGS.get(status, "mobilenet")
@@ -0,0 +1,72 @@
+import os
+import threading
+
+SNIFF_BYTES = 16  # сигнатуры всех поддерживаемых форматов умещаются в начало файла
+
+# Формат, который обещает расширение файла
+EXTENSION_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".gif": "gif", ".bmp": "bmp"}
+
+
+class NotAnImageError(ValueError):
+    """Файл с расширением изображения, но сигнатура не похожа ни на один графический формат"""
+
+
+def sniff_bytes(header):
+    """Настоящий формат по первым байтам файла: jpeg, png, gif, bmp, webp, tiff или None"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header.startswith(b"BM") and len(header) >= 14:
+        return "bmp"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "webp"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return None
+
+
+def read_image_file(path):
+    """Читает файл целиком, но сначала проверяет сигнатуру по первым SNIFF_BYTES байтам:
+    у не-изображения остальное не читается и не декодируется. Возвращает (формат, содержимое)."""
+    with open(path, "rb") as f:
+        header = f.read(SNIFF_BYTES)
+        real = sniff_bytes(header)
+        if real is None:
+            raise NotAnImageError(f"не изображение (начало файла: {header[:8].hex(' ')})")
+        return real, header + f.read()
+
+
+def extension_format(path):
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+class FormatStats:
+    """Файлы с неверным расширением среди декодированных (для итогового отчёта).
+
+    Формат определяет сам декодер из того же чтения файла (read_image_file) и кладёт его
+    в словарь замеров изображения под ключом "format"; take() забирает его оттуда.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mislabeled = {}  # путь -> (формат по расширению, настоящий формат)
+
+    def take(self, path, timings):
+        real = timings.pop("format", None)
+        expected = extension_format(path)
+        if real is not None and expected != real:
+            with self.lock:
+                self.mislabeled[path] = (expected, real)
+
+
+def summarize_mislabeled(mislabeled):
+    """'png→jpeg: 3, ...' — какие форматы выдавали себя за другие"""
+    counts = {}
+    for expected, real in mislabeled.values():
+        key = f"{expected or '?'}→{real}"
+        counts[key] = counts.get(key, 0) + 1
+    return ", ".join(f"{key}: {count}" for key, count in sorted(counts.items(), key=lambda kv: -kv[1]))
+
@@ -0,0 +1,66 @@
+from collections import deque
+from tkinter import scrolledtext
+
+LOG_CONSOLE_LINES = 5000  # строк, которые консоль хранит; старые удаляются из виджета и буфера
+
+SEVERITIES = {"info": 0, "warning": 1, "error": 2}
+LOG_FILTERS = {"Все": "info", "Предупреждения": "warning", "Ошибки": "error"}
+
+# Уровень строки определяется по тем же маркерам, что уже стоят в сообщениях приложения
+ERROR_MARKERS = ("❌", "[ERROR", "[SKIP", "Ошибка", "ошибка")
+WARNING_MARKERS = ("⚠", "| BAD")
+
+
+def severity(line):
+    if any(marker in line for marker in ERROR_MARKERS):
+        return SEVERITIES["error"]
+    if any(marker in line for marker in WARNING_MARKERS):
+        return SEVERITIES["warning"]
+    return SEVERITIES["info"]
+
+
+class LogConsole(scrolledtext.ScrolledText):
+    """Консоль лога с ограниченной историей: кольцевой буфер на capacity строк и фильтр по уровню.
+
+    В виджете никогда не больше capacity строк, поэтому вставка и память не растут с длиной сессии.
+    Буфер хранит строки всех уровней — при смене фильтра консоль перерисовывается из него.
+    """
+
+    def __init__(self, master, capacity=LOG_CONSOLE_LINES, **kwargs):
+        super().__init__(master, **kwargs)
+        self.capacity = capacity
+        self.lines = deque(maxlen=capacity)  # (уровень, строка)
+        self.min_severity = SEVERITIES["info"]
+        self.shown = 0  # строк сейчас в виджете
+
+    def append(self, text):
+        visible = []
+        for line in text.splitlines(keepends=True):
+            level = severity(line)
+            self.lines.append((level, line))
+            if level >= self.min_severity:
+                visible.append(line)
+        if not visible:
+            return
+        visible = visible[-self.capacity:]
+        self.insert("end", "".join(visible))
+        self.shown += len(visible)
+        excess = self.shown - self.capacity
+        if excess > 0:
+            self.delete("1.0", f"{excess + 1}.0")
+            self.shown -= excess
+        self.see("end")
+
+    def set_filter(self, name):
+        """name — ключ LOG_FILTERS"""
+        self.min_severity = SEVERITIES[LOG_FILTERS[name]]
+        visible = [line for level, line in self.lines if level >= self.min_severity]
+        self.delete("1.0", "end")
+        self.insert("end", "".join(visible))
+        self.shown = len(visible)
+        self.see("end")
+
+    def clear(self):
+        self.lines.clear()
+        self.delete("1.0", "end")
+        self.shown = 0
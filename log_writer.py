@@ -0,0 +1,147 @@
+import atexit
+import os
+import threading
+from collections import deque
+
+LOG_PATH = "analyzer_nu.log"
+LOG_BUFFER_MESSAGES = 10000  # сообщений в памяти; при переполнении теряются самые старые
+LOG_FLUSH_INTERVAL = 0.5  # секунд между записями в файл
+LOG_FLUSH_BYTES = 64 * 1024  # или раньше, если накопилось столько текста
+LOG_MAX_BYTES = 10 * 2 ** 20  # размер файла, после которого он ротируется
+LOG_BACKUPS = 3  # analyzer_nu.log.1 ... .3
+
+
+class LogWriter:
+    """Фоновая запись лога в файл: файл открыт всё время, сообщения уходят в него пачками.
+
+    write() только кладёт строку в ограниченный буфер — поток анализа не ждёт диск.
+    Фоновый поток сбрасывает буфер раз в flush_interval или при накоплении flush_bytes;
+    файл больше max_bytes переименовывается в .1 (старые копии сдвигаются, хранится backups штук).
+    """
+
+    def __init__(self, path=LOG_PATH, max_messages=LOG_BUFFER_MESSAGES, flush_interval=LOG_FLUSH_INTERVAL,
+                 flush_bytes=LOG_FLUSH_BYTES, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_messages = max_messages
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._reset()
+
+    def _reset(self):
+        # Также после fork: потоки и блокировки родителя в дочернем процессе не работают
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.io_lock = threading.Lock()  # порядок записи пачек и ротация
+        self.buffer = deque()
+        self.buffered_bytes = 0
+        self.dropped = 0
+        self.file = None
+        self.file_bytes = 0  # размер файла в байтах (кириллица в UTF-8 — два байта на символ)
+        self.thread = None
+        self.closed = False
+
+    def write(self, message):
+        if self.pid != os.getpid():
+            self._reset()
+        with self.condition:
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self.thread.start()
+            if len(self.buffer) >= self.max_messages:
+                self.buffered_bytes -= len(self.buffer.popleft())
+                self.dropped += 1
+            self.buffer.append(message)
+            self.buffered_bytes += len(message)
+            if self.buffered_bytes >= self.flush_bytes:
+                self.condition.notify()
+            closed = self.closed
+        if closed:
+            self.flush()  # после close() фонового потока нет — пишем сразу
+
+    def flush(self):
+        """Записывает всё накопленное в файл (синхронно)"""
+        with self.io_lock:
+            with self.condition:
+                messages = list(self.buffer)
+                dropped = self.dropped
+                self.buffer.clear()
+                self.buffered_bytes = 0
+                self.dropped = 0
+            if dropped:
+                messages.insert(0, f"⚠ Пропущено {dropped} сообщений лога: буфер переполнен\n")
+            if messages:
+                self._write_file("".join(messages))
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+        with self.io_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.buffered_bytes < self.flush_bytes and not self.closed:
+                    self.condition.wait(self.flush_interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def _write_file(self, text):
+        try:
+            size = len(text.encode("utf-8"))
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+                self.file_bytes = self.file.tell()
+            if self.max_bytes and self.file_bytes + size > self.max_bytes and self.file_bytes > 0:
+                self._rotate()
+            self.file.write(text)
+            self.file.flush()
+            self.file_bytes += size
+        except Exception as e:
+            print(f"[Ошибка записи в лог-файл] {e}")
+
+    def _rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.file_bytes = 0
+
+
+class ConsoleMailbox:
+    """Сообщения для Tk-консоли из рабочих потоков: Tk вызывается только из главного потока,
+    поэтому текст копится здесь и забирается в process_queue (take)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # id(консоли) -> [текст]
+
+    def post(self, console, message):
+        with self.lock:
+            self.pending.setdefault(id(console), []).append(message)
+
+    def take(self, console):
+        with self.lock:
+            messages = self.pending.pop(id(console), None)
+        return "".join(messages) if messages else ""
+
+
+LOG_WRITER = LogWriter()
+CONSOLE_MAILBOX = ConsoleMailbox()
+atexit.register(LOG_WRITER.close)
@@ -1,21 +1,55 @@
 # ver 2.1.0
 
 import sys
-import tkinter as tk
 
-import tensorflow as tf
-from PIL import features
+from startup_profile import StartupProfiler
 
-from ui import NSFWAnalyzerApp
 
-print(f"Python version: {sys.version}")
-print(f"TensorFlow version: {tf.__version__}")
-print("Доступные устройства:", tf.config.list_physical_devices())
-print("GPU устройства:", tf.config.list_physical_devices('GPU'))
-print("Список поддерживаемых модулей:", features.get_supported_modules())
+def run_gui(profile_startup=False):
+    """Запускает GUI; с profile_startup печатает профиль запуска после первой отрисовки окна и выходит"""
+    with StartupProfiler(enabled=profile_startup) as profiler:
+        with profiler.phase("импорт tkinter"):
+            import tkinter as tk
 
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = NSFWAnalyzerApp(root)
+        with profiler.phase("импорт PIL"):
+            from PIL import features
+
+        with profiler.phase("импорт ui (analyzer, scanner, batching...)"):
+            from ui import NSFWAnalyzerApp
+
+    # TensorFlow и список устройств выводятся при инициализации модели (analyzer.log_tf_devices)
+    print(f"Python version: {sys.version}")
+    print("Список поддерживаемых модулей:", features.get_supported_modules())
+
+    with profiler.phase("создание окна Tk"):
+        root = tk.Tk()
+    with profiler.phase("NSFWAnalyzerApp (виджеты)"):
+        app = NSFWAnalyzerApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_close)
+
+    if profile_startup:
+        def report_and_exit():
+            print(profiler.report())
+            app.on_close()
+
+        root.update()  # первая отрисовка окна
+        root.after_idle(report_and_exit)
+
     root.mainloop()
+
+
+def main():
+    args = sys.argv[1:]
+    if args == ["--profile-startup"]:
+        run_gui(profile_startup=True)
+        return 0
+    # nsfw-analyzer scan/watch <папка> ... — консольный режим без Tk, иначе GUI
+    if args:
+        from cli import main as cli_main
+        return cli_main(args)
+    run_gui()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MODEL_CACHE_MB = 3072  # сколько памяти могут занимать загруженные модели; сверх — выгружаются давно не нужные
+
+# Атрибуты контекста, которые заполняет загрузка модели (analyzer.load_model) и которые копируются в приложение
+MODEL_ATTRIBUTES = ("model", "model_name", "model_version", "input_spec",
+                    "load_fn", "predict_batch_fn", "nsfw_batch_fn", "predict_fn")
+
+
+def resident_memory():
+    """RSS текущего процесса в байтах; None, если узнать нельзя"""
+    try:
+        import psutil  # необязательная зависимость (Windows, macOS)
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def format_mb(size):
+    return "?" if size is None else f"{size / 2 ** 20:.0f} МБ"
+
+
+class LoadedModel:
+    """Загруженная модель: контекст с атрибутами MODEL_ATTRIBUTES, время загрузки и прирост памяти"""
+
+    def __init__(self, context, load_seconds, size):
+        self.context = context
+        self.load_seconds = load_seconds
+        self.size = size  # прирост RSS при загрузке (у первой модели включает рантайм TensorFlow)
+
+
+class ModelRegistry:
+    """Тёплый кэш загруженных моделей с вытеснением давно не использованных (LRU).
+
+    Ключ — (имя модели, настройки предобработки). Переключение на модель, которая уже в памяти,
+    — только копирование ссылок на её функции. Если сумма размеров превышает budget,
+    выгружаются самые давно использованные модели (кроме только что запрошенной).
+    """
+
+    def __init__(self, budget_mb=MODEL_CACHE_MB):
+        self.budget = budget_mb * 2 ** 20
+        self.models = OrderedDict()  # ключ -> LoadedModel, в конце — последние использованные
+        self.lock = threading.Lock()
+
+    def get_or_load(self, key, load, log=print):
+        """LoadedModel для key; load() -> контекст модели вызывается только при промахе"""
+        with self.lock:
+            loaded = self.models.get(key)
+            if loaded is not None:
+                self.models.move_to_end(key)
+                log(f"⚡ {key[0]}: уже в памяти ({format_mb(loaded.size)}, загрузка заняла "
+                    f"{loaded.load_seconds:.1f} с)\n")
+                return loaded
+
+            before = resident_memory()
+            started = time.perf_counter()
+            context = load()
+            load_seconds = time.perf_counter() - started
+            after = resident_memory()
+            size = max(0, after - before) if before is not None and after is not None else None
+            if context.model is None:
+                return LoadedModel(context, load_seconds, size)  # неизвестная модель — не кэшируем
+
+            loaded = self.models[key] = LoadedModel(context, load_seconds, size)
+            log(f"🧠 {key[0]}: загружена за {load_seconds:.1f} с, память +{format_mb(size)}\n")
+            self._evict_locked(keep=key, log=log)
+            return loaded
+
+    def _evict_locked(self, keep, log):
+        evicted = False
+        while self.total_size() > self.budget and len(self.models) > 1:
+            key = next(iter(self.models))
+            if key == keep:
+                break
+            loaded = self.models.pop(key)
+            log(f"♻ {key[0]}: выгружена из памяти (давно не использовалась, {format_mb(loaded.size)})\n")
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def total_size(self):
+        return sum(loaded.size or 0 for loaded in self.models.values())
+
+    def set_budget(self, budget_mb):
+        self.budget = budget_mb * 2 ** 20
+
+    def report(self):
+        """'yahoo nsfw 410 МБ, gantman nsfw 95 МБ — 505 МБ из 3072 МБ'"""
+        with self.lock:
+            entries = ", ".join(f"{key[0]} {format_mb(loaded.size)}" for key, loaded in self.models.items())
+            return f"{entries or 'нет моделей'} — {format_mb(self.total_size())} из {format_mb(self.budget)}"
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+        gc.collect()
+
+
+# Один реестр на процесс: GUI, CLI и каждый процесс пула держат свои модели
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WorkerGate:
+    """Сколько из запущенных потоков стадии сейчас берут задания; limit можно менять на ходу (autotune).
+
+    Потоки с номером >= limit не завершаются, а ждут, пока limit снова не вырастет или задания не кончатся.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.finished = False
+        self.condition = threading.Condition()
+
+    def set_limit(self, limit):
+        with self.condition:
+            self.limit = max(1, limit)
+            self.condition.notify_all()
+
+    def wait_turn(self, index, should_stop):
+        """False — заданий больше нет или анализ остановлен"""
+        with self.condition:
+            while index >= self.limit and not self.finished:
+                if should_stop():
+                    return False
+                self.condition.wait(0.1)
+            return not self.finished
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+
+def run_decode_stage(jobs, decode_job, workers, should_stop, gate=None):
+    """Стадия чтения/декодирования: workers потоков разбирают задания из общего итератора.
+
+    Задания берутся лениво, по одному на поток, поэтому в памяти одновременно находятся
+    только декодируемые файлы и ограниченная очередь батчера — даже для папок на сотни тысяч файлов.
+    decode_job(job) читает и декодирует файл и отдаёт тензор в BatchInferencer.submit,
+    который блокирует поток, пока модель не освободит место в очереди (backpressure).
+    gate (WorkerGate) — сколько из workers потоков работают в данный момент.
+    """
+    jobs = iter(jobs)
+    jobs_lock = threading.Lock()
+
+    def worker(index):
+        while not should_stop():
+            if gate is not None and not gate.wait_turn(index, should_stop):
+                return
+            with jobs_lock:
+                job = next(jobs, None)
+            if job is None:
+                if gate is not None:
+                    gate.finish()
+                return
+            decode_job(job)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor:
+        futures = [executor.submit(worker, index) for index in range(workers)]
+        for future in futures:
+            future.result()
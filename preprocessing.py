@@ -0,0 +1,129 @@
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from formats import read_image_file
+
+INPUT_SIZE = (224, 224)  # вход всех моделей
+
+# Входит в версию модели (ключ кэша результатов): при смене предобработки старые оценки не используются
+PREPROCESS_VERSION = "spec-1"
+
+
+class InputSpec:
+    """Вход модели: размер, центральный кроп, порядок каналов и нормализация.
+
+    Значение канала = (пиксель * scale - mean) / std, пиксель — 0..255 в порядке channel_order.
+    Нормализация сведена к одному умножению и сложению над всем массивом (multiplier, offset).
+    """
+
+    def __init__(self, name, size=INPUT_SIZE, crop=None, channel_order="RGB", scale=1.0,
+                 mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0), reencode_jpeg=False):
+        self.name = name
+        self.size = size  # (ширина, высота) после сжатия
+        self.crop = crop  # (ширина, высота) центрального кропа или None
+        self.channel_order = channel_order
+        self.reencode_jpeg = reencode_jpeg  # повторное сжатие в JPEG после ресайза, как у оригинальной Yahoo
+        std = np.asarray(std, dtype=np.float32)
+        self.multiplier = np.float32(scale) / std
+        self.offset = -np.asarray(mean, dtype=np.float32) / std
+
+    def __repr__(self):
+        return f"InputSpec({self.name})"
+
+    def transform(self, img):
+        """Декодированное RGB-изображение PIL -> float32 массив (H, W, 3) для модели"""
+        if img.size != self.size:
+            img = img.resize(self.size, Image.BILINEAR)
+        if self.reencode_jpeg:
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG")
+            buffer.seek(0)
+            img = Image.open(buffer)
+        pixels = np.asarray(img)
+        if self.crop is not None:
+            left = (self.size[0] - self.crop[0]) // 2
+            top = (self.size[1] - self.crop[1]) // 2
+            pixels = pixels[top:top + self.crop[1], left:left + self.crop[0]]
+        if self.channel_order == "BGR":
+            pixels = pixels[..., ::-1]
+        return pixels * self.multiplier + self.offset  # uint8 * float32 -> float32
+
+
+# Входы моделей приложения
+YAHOO_SPEC = InputSpec("yahoo", size=(256, 256), crop=INPUT_SIZE, channel_order="BGR",
+                       mean=(104.0, 117.0, 123.0), reencode_jpeg=True)  # = opennsfw2.Preprocessing.YAHOO
+MOBILENET_SPEC = InputSpec("mobilenet_v2", scale=1 / 127.5, mean=(1.0, 1.0, 1.0))  # = mobilenet_v2.preprocess_input
+NSFW_HUB_SPEC = InputSpec("nsfw_hub", scale=1 / 255.0)
+GANTMAN_SPEC = InputSpec("gantman", scale=1 / 255.0)
+TF_HUB_SPEC = InputSpec("tf_hub")  # пиксели 0..255 без нормализации
+
+
+def open_image(img_path, min_size=INPUT_SIZE, draft=True, data=None):
+    """Открывает изображение; JPEG декодируется сразу в уменьшенном виде.
+
+    draft() просит libjpeg масштабировать при декодировании (DCT scaling 1/2, 1/4, 1/8) и выбирает
+    наименьший масштаб, при котором обе стороны не меньше min_size: 12-мегапиксельный снимок
+    декодируется как ~500x375 вместо 4000x3000, а дальше всё равно сжимается до 224x224.
+    Для остальных форматов draft() ничего не делает. data — уже прочитанное содержимое файла.
+    """
+    try:
+        img = Image.open(img_path if data is None else io.BytesIO(data))
+    except Image.UnidentifiedImageError:
+        # Сигнатура уже проверена (read_image_file) — значит, файл повреждён
+        raise ValueError(f"повреждённое изображение: {img_path}")
+    if draft and img.format == "JPEG":
+        img.draft("RGB", min_size)
+    return img
+
+
+def decode(img_path, specs, draft=True, timings=None):
+    """Одно чтение и декодирование файла для любого числа моделей: RGB-изображение PIL,
+    не меньше самого крупного входа из specs.
+
+    Файл читается один раз (formats.read_image_file): не-изображение отсеивается по первым байтам
+    с NotAnImageError до чтения остального. timings — dict для stage_timing: время чтения ("read")
+    и декодирования ("decode"), а также настоящий формат файла ("format", см. formats.FormatStats).
+    """
+    min_size = (max(spec.size[0] for spec in specs), max(spec.size[1] for spec in specs))
+    started = time.perf_counter()
+    real, data = read_image_file(img_path)
+    decode_started = time.perf_counter()
+    if timings is not None:
+        timings["read"] = decode_started - started
+        timings["format"] = real
+    img = open_image(img_path, min_size, draft, data)
+    if img.mode == "RGB":
+        img.load()  # однокадровый файл PIL закрывает сам после чтения
+    else:
+        with img:
+            img = img.convert("RGB")  # в т.ч. первый кадр GIF и палитровые PNG
+    if timings is not None:
+        timings["decode"] = time.perf_counter() - decode_started
+    return img
+
+
+def load_many(img_path, specs, draft=True, timings=None):
+    """Файл -> [массив для каждого spec]: декодирование одно, преобразования — по числу моделей"""
+    img = decode(img_path, specs, draft, timings)
+    started = time.perf_counter()
+    tensors = [spec.transform(img) for spec in specs]
+    if timings is not None:
+        timings["preprocess"] = time.perf_counter() - started
+    return tensors
+
+
+def make_loader(spec, draft=True):
+    """load_fn(путь, timings=None) для модели с входом spec"""
+    specs = (spec,)
+    return lambda img_path, timings=None: load_many(img_path, specs, draft, timings)[0]
+
+
+def load_rgb(img_path, size=INPUT_SIZE, draft=True):
+    """Файл -> uint8 массив (H, W, 3) размера size без нормализации (бенчмарки, сравнение декодеров)"""
+    img = decode(img_path, (InputSpec("rgb", size=size),), draft)
+    if img.size != size:
+        img = img.resize(size, Image.BILINEAR)
+    return np.asarray(img)
@@ -0,0 +1,167 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from formats import NotAnImageError
+from utils import get_cpu_cores
+
+SHARD_SIZE = 64  # сколько файлов отдаём процессу за раз
+
+_worker = None  # контекст модели внутри процесса-воркера
+
+
+class WorkerContext:
+    """Контекст без Tk: initialize_model заполняет его так же, как NSFWAnalyzerApp"""
+
+    def __init__(self):
+        self.log_console = None
+        self.model = None
+        self.predict_fn = None
+        self.load_fn = None
+        self.predict_batch_fn = None
+        self.nsfw_batch_fn = None
+        self.input_spec = None
+        self.jpeg_draft = True
+
+
+def default_process_workers():
+    # Каждый процесс держит свою копию модели в памяти, поэтому не больше половины ядер
+    return max(1, min(8, get_cpu_cores() // 2))
+
+
+# ---------------------- КОД ПРОЦЕССА-ВОРКЕРА ----------------------
+def _init_worker(model_name, tf_threads, settings):
+    """Выполняется один раз в каждом процессе: загружает свою копию модели"""
+    global _worker
+    import tensorflow as tf
+
+    # Делим ядра между процессами, иначе каждый TF займёт все ядра
+    tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from analyzer import initialize_model
+    _worker = WorkerContext()
+    for name, value in settings.items():
+        setattr(_worker, name, value)  # jpeg_draft, параметры ансамбля (analyzer.WORKER_SETTINGS)
+    initialize_model(_worker, model_name)
+
+
+def _process_shard(paths, batch_size):
+    """Декодирует шард и прогоняет его батчами; возвращает [(path, result, error, timings), ...],
+    timings — время стадий изображения (stage_timing), включая долю прогона батча ("inference")"""
+    results = {}
+    timings = {path: {} for path in paths}
+    ok_paths = []
+    tensors = []
+    for path in paths:
+        try:
+            tensors.append(_worker.load_fn(path, timings[path]))
+            ok_paths.append(path)
+        except NotAnImageError as e:
+            results[path] = (None, e)  # тип нужен родителю для подсчёта не-изображений
+        except Exception as e:
+            results[path] = (None, str(e))
+
+    for start in range(0, len(ok_paths), batch_size):
+        chunk = ok_paths[start:start + batch_size]
+        chunk_tensors = tensors[start:start + batch_size]
+        try:
+            started = time.perf_counter()
+            chunk_results = _worker.predict_batch_fn(np.stack(chunk_tensors))
+            forward = (time.perf_counter() - started) / len(chunk)
+            for path, result in zip(chunk, chunk_results):
+                results[path] = (result, None)
+                timings[path]["inference"] = forward
+        except Exception:
+            # Битый тензор в батче — прогоняем поштучно
+            for path, tensor in zip(chunk, chunk_tensors):
+                try:
+                    results[path] = (_worker.predict_batch_fn(np.expand_dims(tensor, 0))[0], None)
+                except Exception as e:
+                    results[path] = (None, str(e))
+
+    return [(path, *results[path], timings[path]) for path in paths]
+
+
+# ---------------------- КОД РОДИТЕЛЬСКОГО ПРОЦЕССА ----------------------
+def run_process_stage(jobs, model_name, workers, batch_size, on_result, should_stop, settings=None, timer=None,
+                      formats=None):
+    """Анализ в пуле процессов: шарды по SHARD_SIZE файлов, результаты передаются в on_result по мере готовности.
+
+    jobs — список (item, path); on_result(key, result, error) вызывается в текущем потоке
+    с key = (item, path, время отправки шарда). В работе одновременно не больше workers * 2 шардов.
+    settings — атрибуты контекста модели для процессов (analyzer.worker_settings);
+    timer (stage_timing.StageTimer) получает время стадий, замеренное в процессах,
+    formats (formats.FormatStats) — настоящие форматы файлов, определённые декодером.
+    Если пул сломан (процесс не смог загрузить модель или упал), оставшиеся файлы получают ошибку.
+    Возвращает число обработанных шардов.
+    """
+    tf_threads = max(1, get_cpu_cores() // workers)
+    shards = (jobs[i:i + SHARD_SIZE] for i in range(0, len(jobs), SHARD_SIZE))
+    in_flight = {}
+    shard_count = 0
+    broken = None  # BrokenProcessPool: новые шарды больше не отправляются
+
+    def fail_shard(shard, error):
+        started = time.time()
+        for item, path in shard:
+            on_result((item, path, started), None, error)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_name, tf_threads, settings or {})) as executor:
+
+        def submit_next():
+            nonlocal broken
+            if broken is not None:
+                return False
+            shard = next(shards, None)
+            if shard is None:
+                return False
+            try:
+                future = executor.submit(_process_shard, [path for _, path in shard], batch_size)
+            except BrokenProcessPool as e:
+                broken = e
+                fail_shard(shard, f"пул процессов остановлен: {e}")
+                return False
+            in_flight[future] = (shard, time.time())
+            return True
+
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard, started = in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                try:
+                    rows = future.result()
+                except BrokenProcessPool as e:
+                    broken = e
+                    rows = [(path, None, f"пул процессов остановлен: {e}", {}) for _, path in shard]
+                except Exception as e:
+                    rows = [(path, None, str(e), {}) for _, path in shard]
+                for (item, path), (_, result, error, timings) in zip(shard, rows):
+                    if formats is not None:
+                        formats.take(path, timings)
+                    if timer is not None:
+                        timer.record_many(timings)
+                    on_result((item, path, started), result, error)
+                shard_count += 1
+
+                if should_stop():
+                    # Новые шарды не отправляем, ещё не начатые отменяем
+                    for pending in in_flight:
+                        pending.cancel()
+                else:
+                    submit_next()
+
+    # Пул сломан: ещё не отправленные шарды не обработает никто
+    if broken is not None and not should_stop():
+        for shard in shards:
+            fail_shard(shard, f"пул процессов остановлен: {broken}")
+    return shard_count
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Кэш общий для всех папок: результат привязан к (путь, размер, mtime, модель, версия модели)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".nsfw_analyzer")
+CACHE_PATH = os.path.join(CACHE_DIR, "results_cache.sqlite3")
+FLUSH_EVERY = 500  # сколько новых результатов копим перед записью на диск
+
+
+class ResultCache:
+    """Постоянный кэш оценок модели в SQLite.
+
+    Запись считается актуальной, только если размер и mtime файла совпадают с сохранёнными,
+    поэтому изменённые файлы анализируются заново, а неизменённые пропускаются.
+    Методы потокобезопасны: get вызывается из потоков декодирования, put — из потока инференса.
+    """
+
+    def __init__(self, db_path=CACHE_PATH):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " path TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " score REAL NOT NULL,"
+            " label TEXT,"
+            " models TEXT,"
+            " PRIMARY KEY (path, model, version))"
+        )
+        # Кэш, созданный до появления столбца models (оценки моделей ансамбля и каскада)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(results)")}
+        if "models" not in columns:
+            self.conn.execute("ALTER TABLE results ADD COLUMN models TEXT")
+        self.conn.commit()
+
+    def get(self, path, size, mtime_ns, model, version):
+        """Возвращает (score, label), у ансамбля и каскада — (score, label, {модель: оценка}),
+        или None, если записи нет или файл изменился"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, score, label, models FROM results WHERE path=? AND model=? AND version=?",
+                (path, model, version),
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        if row[4]:
+            return row[2], row[3], json.loads(row[4])
+        return row[2], row[3]
+
+    def put(self, path, size, mtime_ns, model, version, score, label, models=None):
+        """Запоминает результат (models — оценки отдельных моделей); на диск пишется пачками по FLUSH_EVERY"""
+        if models:
+            models = json.dumps({name: float(value) for name, value in models.items()}, ensure_ascii=False)
+        with self.lock:
+            self.pending.append((path, model, version, size, mtime_ns, float(score), label, models or None))
+            if len(self.pending) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def rename_many(self, moves):
+        """Переносит результаты перемещённых файлов [(старый путь, новый путь), ...] на новые пути"""
+        with self.lock:
+            self._flush_locked()
+            self.conn.executemany("UPDATE OR REPLACE results SET path=? WHERE path=?",
+                                  [(new, old) for old, new in moves])
+            self.conn.commit()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            self.conn.close()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results (path, model, version, size, mtime_ns, score, label, models)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self.pending,
+        )
+        self.conn.commit()
+        self.pending = []
+
+
+def file_signature(self, img_path):
+    """(размер, mtime_ns) файла: берём из результатов сканирования, иначе делаем stat"""
+    signature = self.file_stats.get(img_path) if hasattr(self, "file_stats") else None
+    if signature is None:
+        stat = os.stat(img_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+    return signature
@@ -1,15 +1,155 @@
 import datetime
 import os
-import tkinter as tk
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from snapshot import start_snapshot_diff
 from utils import convert_size, log_message
 
+SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+SCAN_BATCH = 500  # сколько найденных файлов отдаём в таблицу за раз
+SCAN_WORKERS = 1  # потоков листинга папок; >1 — параллельный обход (сетевые шары с большой задержкой)
+SCAN_QUEUE_PER_WORKER = 4  # листингов в работе и в ожидании выдачи на один поток
+
+
+class ScanStats:
+    """Счётчики обхода для оценки прогресса, пока общее число файлов ещё неизвестно"""
+
+    def __init__(self):
+        self.files = 0
+        self.dirs_done = 0
+        self.dirs_pending = 1  # корневая папка
+        self.errors = 0
+
+    def estimate(self):
+        """Оценка общего числа файлов: среднее по пройденным папкам * все известные папки"""
+        if not self.dirs_done:
+            return self.files
+        per_dir = self.files / self.dirs_done
+        return self.files + int(per_dir * self.dirs_pending)
+
+
+def iter_image_files(folder_path, stats=None, should_stop=None):
+    """Однопроходный обход через os.scandir: отдаёт (путь, st_size, st_mtime_ns, inode) по мере нахождения.
+
+    Тип записи и inode берутся из листинга каталога, stat — из DirEntry (на Windows без отдельного
+    запроса, на Linux — один запрос на файл), второго прохода с os.stat нет.
+    Недоступные папки и файлы пропускаются и считаются в stats.errors.
+    """
+    stats = stats or ScanStats()
+    pending = [folder_path]
+    while pending:
+        if should_stop and should_stop():
+            return
+        directory = pending.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(SUPPORTED_FORMATS):
+                            stat = entry.stat()
+                            stats.files += 1
+                            yield entry.path, stat.st_size, stat.st_mtime_ns, entry.inode()
+                    except OSError:
+                        stats.errors += 1
+        except OSError:
+            stats.errors += 1
+        # В обратном порядке, чтобы обходить подпапки в порядке листинга
+        pending.extend(reversed(subdirs))
+        stats.dirs_done += 1
+        stats.dirs_pending = len(pending)
+
+
+def _list_directory(directory):
+    """Листинг одной папки для параллельного обхода: (файлы [(путь, size, mtime_ns, inode)], подпапки, ошибки)"""
+    files = []
+    subdirs = []
+    errors = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(SUPPORTED_FORMATS):
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_size, stat.st_mtime_ns, entry.inode()))
+                except OSError:
+                    errors += 1
+    except OSError:
+        errors += 1
+    return files, subdirs, errors
+
+
+def iter_image_files_parallel(folder_path, workers, stats=None, should_stop=None, ordered=False):
+    """Обход, в котором папки листятся параллельно пулом из workers потоков.
+
+    В работе одновременно не больше workers * SCAN_QUEUE_PER_WORKER листингов.
+    ordered=False — файлы отдаются по мере готовности папок (порядок зависит от задержек);
+    ordered=True — в детерминированном порядке: обход в глубину, папки и файлы по имени,
+    листинги следующих по порядку папок идут заранее.
+    """
+    stats = stats or ScanStats()
+    limit = max(1, workers) * SCAN_QUEUE_PER_WORKER
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan")
+    try:
+        if ordered:
+            yield from _walk_ordered(executor, folder_path, limit, stats, should_stop)
+        else:
+            yield from _walk_unordered(executor, folder_path, limit, stats, should_stop)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _walk_unordered(executor, folder_path, limit, stats, should_stop):
+    pending = [folder_path]
+    in_flight = set()
+    while pending or in_flight:
+        if should_stop and should_stop():
+            return
+        while pending and len(in_flight) < limit:
+            in_flight.add(executor.submit(_list_directory, pending.pop()))
+        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            files, subdirs, errors = future.result()
+            pending.extend(subdirs)
+            stats.errors += errors
+            stats.files += len(files)
+            stats.dirs_done += 1
+            stats.dirs_pending = len(pending) + len(in_flight)
+            yield from files
+
+
+def _walk_ordered(executor, folder_path, limit, stats, should_stop):
+    order = [folder_path]  # стек обхода в глубину: следующая папка — в конце
+    futures = {}  # папка -> листинг (в работе или готов, но ещё не выдан)
+    while order:
+        if should_stop and should_stop():
+            return
+        # Заранее листим ближайшие по порядку папки; каждая просмотренная уже занимает место в лимите
+        for directory in reversed(order):
+            if len(futures) >= limit:
+                break
+            if directory not in futures:
+                futures[directory] = executor.submit(_list_directory, directory)
+
+        directory = order.pop()
+        files, subdirs, errors = futures.pop(directory).result()
+        order.extend(sorted(subdirs, reverse=True))
+        stats.errors += errors
+        stats.files += len(files)
+        stats.dirs_done += 1
+        stats.dirs_pending = len(order)
+        yield from sorted(files)
+
 
 def scan_folder_async2(self, folder_path):
     """Асинхронное сканирование папки"""
     self.status_var.set("Сканирование...")
     self.progress.start()
-    self.analyze_button.config(state=tk.DISABLED)
+    self.analyze_button.config(state="disabled")
 
     supported_formats = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
     file_count = 0
@@ -48,65 +188,50 @@ def scan_folder_async2(self, folder_path):
 
 
 def scan_folder_async(self, folder_path):
-    """Асинхронное сканирование папки с прогресс-баром"""
-
-    # Сначала считаем общее количество файлов
-    supported_formats = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-    all_files = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(supported_formats):
-                all_files.append(os.path.join(root, file))
-    total_files = len(all_files)
-
-    self.progress.stop()
-    self.progress["value"] = 0
-    self.progress["maximum"] = total_files
-    self.status_var.set("Сканирование...")
-    self.analyze_button.config(state=tk.DISABLED)
+    """Потоковое сканирование папки: строки появляются в таблице по мере обхода"""
+    self.image_queue.put(("status", "Сканирование..."))
+    self.analyze_button.config(state="disabled")
+
+    stats = ScanStats()
+    workers = getattr(self, "scan_workers", SCAN_WORKERS)
+    self.scan_root = folder_path
+    self.scan_delta = None
+    # Инкрементальный режим: по ходу обхода сравниваем с прошлым снимком папки
+    diff = start_snapshot_diff(self, folder_path)
+
+    def should_stop():
+        return self.stop_analysis
+
+    if workers > 1:
+        entries = iter_image_files_parallel(folder_path, workers, stats, should_stop,
+                                            ordered=getattr(self, "scan_ordered", False))
+    else:
+        entries = iter_image_files(folder_path, stats, should_stop)
 
     batch = []
-    processed_count = 0
-
-    for img_path in all_files:
-        if self.stop_analysis:
-            log_message("⛔ Сканирование прервано пользователем\n")
-            return
-
-        try:
-            stat = os.stat(img_path)
-            size = convert_size(stat.st_size)
-            mtime = datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
-            processed_count += 1
-            batch.append((processed_count, os.path.basename(img_path), img_path, size, mtime, "", ""))
-
-            # # обновляем прогресс
-            # self.progress["value"] = processed_count
-            # self.status_var.set(f"Сканирование... ({processed_count}/{total_files})")
-
-            if len(batch) >= 100:
-                self.update_file_list(batch)
-                batch = []
-                # обновляем прогресс
-                self.progress["value"] = processed_count
-                self.status_var.set(f"Сканирование... ({processed_count}/{total_files})")
-
-
-        except Exception as e:
-            self.image_queue.put(("log", f"Ошибка обработки {img_path}: {e}\n"))
+    for entry in entries:
+        batch.append(entry)
+        if diff is not None:
+            diff.add(entry)
+        if len(batch) >= SCAN_BATCH:
+            self.update_file_list(batch)
+            batch = []
+            self.image_queue.put(("scan_progress", stats.files, stats.estimate()))
 
     if batch:
         self.update_file_list(batch)
 
-    self.progress["value"] = total_files
-    self.status_var.set(f"Загружено {processed_count} изображений")
-    self.analyze_button.config(state=tk.NORMAL)
+    if self.stop_analysis:
+        self.image_queue.put(("log", "⛔ Сканирование прервано пользователем\n"))
+    elif diff is not None:
+        self.scan_delta = diff.finish()
+        self.image_queue.put(("log", self.scan_delta.summary()))
+    if stats.errors:
+        self.image_queue.put(("log", f"⚠ Недоступных папок и файлов при сканировании: {stats.errors}\n"))
+    self.image_queue.put(("scan_complete", stats.files))
 
 
 def update_file_list(self, batch):
-    """Сохраняет и отображает список файлов"""
-    self.all_files.extend(batch)  # Сохраняем в память
+    """Передаёт пачку найденных файлов [(путь, st_size, st_mtime_ns, inode), ...] в таблицу (в потоке Tk)"""
+    self.root.after(0, lambda: self.add_files(batch))
 
-    self.root.after(0, lambda: [
-        self.result_tree.insert("", "end", values=item) for item in batch
-    ])
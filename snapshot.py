@@ -0,0 +1,126 @@
+import os
+import sqlite3
+
+from result_cache import CACHE_DIR
+from utils import log_message
+
+# Снимки сканирования для инкрементального пересканирования (по одному на корневую папку)
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "scan_snapshots.sqlite3")
+
+
+class ScanSnapshot:
+    """Состояние папки на момент последнего полного анализа: путь -> (размер, mtime_ns, inode)"""
+
+    def __init__(self, db_path=SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " root TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " PRIMARY KEY (root, path))"
+        )
+        self.conn.commit()
+
+    def load(self, root):
+        """Словарь путь -> (size, mtime_ns, inode); пустой, если папку ещё не сканировали"""
+        rows = self.conn.execute(
+            "SELECT path, size, mtime_ns, inode FROM files WHERE root=?", (os.path.abspath(root),)
+        )
+        return {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in rows}
+
+    def save(self, root, entries):
+        """Заменяет снимок папки записями [(путь, size, mtime_ns, inode), ...]"""
+        root = os.path.abspath(root)
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE root=?", (root,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (root, path, size, mtime_ns, inode) VALUES (?, ?, ?, ?, ?)",
+                ((root, *entry) for entry in entries),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class SnapshotDiff:
+    """Сравнивает текущий обход с прошлым снимком по мере поступления файлов.
+
+    add() вызывается для каждого найденного файла, finish() — после обхода.
+    Файл с тем же inode, размером и mtime, исчезнувший по старому пути и найденный по новому,
+    считается перемещённым, а не удалённым + новым.
+    """
+
+    def __init__(self, previous):
+        self.previous = previous  # забирается по мере обхода; остаток — удалённые файлы
+        self.first_scan = not previous
+        self.added = []
+        self.modified = []
+        self.removed = []
+        self.moved = []  # (старый путь, новый путь)
+        self.unchanged = 0
+
+    def add(self, entry):
+        path, size, mtime_ns, inode = entry
+        old = self.previous.pop(path, None)
+        if old is None:
+            self.added.append(entry)
+        elif old != (size, mtime_ns, inode):
+            self.modified.append(path)
+        else:
+            self.unchanged += 1
+
+    def finish(self):
+        removed = {(size, mtime_ns, inode): path for path, (size, mtime_ns, inode) in self.previous.items()}
+        added = []
+        for path, size, mtime_ns, inode in self.added:
+            old_path = removed.pop((size, mtime_ns, inode), None) if inode else None
+            if old_path is not None:
+                self.moved.append((old_path, path))
+            else:
+                added.append(path)
+        self.added = added
+        self.removed = sorted(removed.values())
+        self.previous = None
+        return self
+
+    def changed_paths(self):
+        """Пути, которые нужно анализировать: новые, изменённые и перемещённые"""
+        return set(self.added) | set(self.modified) | {new for _, new in self.moved}
+
+    def summary(self):
+        if self.first_scan:
+            return "🗂 Снимка папки ещё нет: анализируются все файлы\n"
+        return (f"🗂 Изменения с прошлого анализа: новых {len(self.added)}, изменённых {len(self.modified)}, "
+                f"перемещённых {len(self.moved)}, удалённых {len(self.removed)}, без изменений {self.unchanged}\n")
+
+
+def start_snapshot_diff(self, folder_path):
+    """SnapshotDiff против прошлого снимка папки; None — инкрементальный режим выключен или снимок недоступен"""
+    if not getattr(self, "incremental", False):
+        return None
+    try:
+        snapshot = ScanSnapshot(getattr(self, "snapshot_path", None) or SNAPSHOT_PATH)
+        try:
+            return SnapshotDiff(snapshot.load(folder_path))
+        finally:
+            snapshot.close()
+    except Exception as e:
+        log_message(f"⚠ Снимок папки недоступен, анализируются все файлы: {e}\n", self.log_console)
+        return None
+
+
+def save_folder_snapshot(self, folder_path, entries):
+    """Запоминает состояние папки после полного анализа, чтобы следующий запуск взял только изменения"""
+    try:
+        snapshot = ScanSnapshot(getattr(self, "snapshot_path", None) or SNAPSHOT_PATH)
+        try:
+            snapshot.save(folder_path, entries)
+        finally:
+            snapshot.close()
+    except Exception as e:
+        log_message(f"⚠ Не удалось сохранить снимок папки: {e}\n", self.log_console)
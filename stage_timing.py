@@ -0,0 +1,123 @@
+import json
+import math
+import os
+import threading
+
+from result_cache import CACHE_DIR
+
+TIMINGS_PATH = os.path.join(CACHE_DIR, "stage_timings.json")  # последний прогон GUI
+
+# Стадии конвейера в порядке прохождения изображения
+STAGES = ("read", "decode", "preprocess", "queue", "inference", "apply")
+STAGE_LABELS = {
+    "read": "чтение файла",
+    "decode": "декодирование",
+    "preprocess": "предобработка",
+    "queue": "ожидание батча",
+    "inference": "инференс",
+    "apply": "выдача результата",
+}
+PERCENTILES = (50, 95, 99)
+
+# Логарифмическая гистограмма: память постоянна при любом числе изображений,
+# перцентиль определяется с точностью до ширины корзины (10%)
+BUCKET_RATIO = 1.1
+BUCKET_MIN = 1e-6  # 1 мкс
+BUCKETS = 260  # до BUCKET_MIN * BUCKET_RATIO ** BUCKETS ≈ 16 часов
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= BUCKET_MIN:
+            index = 0
+        else:
+            index = min(BUCKETS, int(math.log(seconds / BUCKET_MIN, BUCKET_RATIO)) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Верхняя граница корзины, в которую попал p-й перцентиль (секунды)"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100.0)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, BUCKET_MIN * BUCKET_RATIO ** index)
+        return self.max
+
+
+class StageTimer:
+    """Время каждой стадии на изображение (STAGES): гистограммы с p50/p95/p99.
+
+    record() вызывается из потоков декодирования, инференса и выдачи результатов одновременно.
+    """
+
+    def __init__(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].add(seconds)
+
+    def record_each(self, stage, values):
+        """Несколько замеров одной стадии (изображения одного батча)"""
+        with self.lock:
+            histogram = self.histograms[stage]
+            for seconds in values:
+                histogram.add(seconds)
+
+    def record_many(self, timings):
+        """timings — {стадия: секунды} одного изображения"""
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.histograms[stage].add(seconds)
+
+    def as_dict(self):
+        """Для JSON: {стадия: {count, total_s, mean_ms, max_ms, p50_ms, p95_ms, p99_ms}}"""
+        with self.lock:
+            result = {}
+            for stage in STAGES:
+                histogram = self.histograms[stage]
+                if not histogram.count:
+                    continue
+                entry = {
+                    "count": histogram.count,
+                    "total_s": round(histogram.total, 6),
+                    "mean_ms": round(histogram.total / histogram.count * 1000.0, 4),
+                    "max_ms": round(histogram.max * 1000.0, 4),
+                }
+                for p in PERCENTILES:
+                    entry[f"p{p}_ms"] = round(histogram.percentile(p) * 1000.0, 4)
+                result[stage] = entry
+            return result
+
+    def report(self):
+        """Строки для итогового отчёта; стадии без замеров (например, кэш) пропускаются"""
+        stages = self.as_dict()
+        if not stages:
+            return ""
+        busiest = max(stages, key=lambda stage: stages[stage]["total_s"])
+        lines = ["⏱ Стадии на изображение, ms (p50 / p95 / p99, всего):"]
+        for stage, entry in stages.items():
+            lines.append(f"   {STAGE_LABELS[stage]:<18} {entry['p50_ms']:8.2f} / {entry['p95_ms']:8.2f} / "
+                         f"{entry['p99_ms']:8.2f}   {entry['total_s']:.2f} с{'  ◀' if stage == busiest else ''}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, extra=None):
+        """JSON с гистограммами стадий; extra — дополнительные поля (модель, число файлов)"""
+        data = dict(extra or {})
+        data["stages"] = self.as_dict()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,73 @@
+"""Замер времени запуска GUI: python main.py --profile-startup"""
+
+import builtins
+import contextlib
+import sys
+import time
+
+# Эти модули не должны загружаться до выбора модели
+HEAVY_MODULES = ("tensorflow", "keras", "opennsfw2", "tensorflow_hub")
+TOP_IMPORTS = 15
+
+
+class StartupProfiler:
+    """Замеряет фазы запуска и время первых импортов модулей (включая вложенные)"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []  # (название, секунды)
+        self.imports = {}  # модуль -> (секунды с учётом вложенных импортов, глубина)
+        self._depth = 0
+        self._original_import = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        depth = self._depth
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            self.imports.setdefault(name, (time.perf_counter() - started, depth))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, time.perf_counter() - started))
+
+    def report(self):
+        total = time.perf_counter() - self.start
+        lines = ["", "⏱ Профиль запуска"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<40} {seconds * 1000:9.1f} ms")
+        lines.append(f"  {'Итого до первой отрисовки окна':<40} {total * 1000:9.1f} ms")
+
+        lines.append(f"  Самые медленные импорты (с вложенными, топ-{TOP_IMPORTS}):")
+        slowest = sorted(self.imports.items(), key=lambda kv: kv[1][0], reverse=True)[:TOP_IMPORTS]
+        for name, (seconds, depth) in slowest:
+            lines.append(f"    {'  ' * min(depth, 4)}{name:<36} {seconds * 1000:9.1f} ms")
+
+        heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+        if heavy:
+            lines.append(f"  ⚠ При запуске загружены тяжёлые модули: {', '.join(heavy)}")
+        else:
+            lines.append("  ✅ TensorFlow / keras / opennsfw2 при запуске не загружались")
+        return "\n".join(lines) + "\n"
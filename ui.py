@@ -1,4 +1,3 @@
-import datetime
 import functools
 import os
 import queue
@@ -6,14 +5,35 @@ import shutil
 import subprocess
 import sys
 import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
+from tkinter import ttk, messagebox, filedialog
 
 from PIL import Image, ImageTk
 
 from analyzer import initialize_model, analyze_images
-from scanner import scan_folder_async, update_file_list
-from utils import log_message
+from batching import BATCH_MAX_WAIT, BATCH_SIZE
+from ensemble import CASCADE_BAND, COMBINERS, DEFAULT_COMBINER, is_ensemble
+from filestore import COLUMNS, FileStore
+from log_console import LOG_FILTERS, LogConsole
+from log_writer import CONSOLE_MAILBOX
+from model_registry import MODEL_CACHE_MB, MODEL_REGISTRY
+from scanner import SCAN_WORKERS, scan_folder_async, update_file_list
+from stage_timing import TIMINGS_PATH
+from ui_updates import BUSY_TICK_MS, FRAME_BUDGET_MS, IDLE_TICK_MS
+from utils import log_message, sort_table_column
+from virtual_table import VirtualTable
+from watcher import WATCH_SETTLE, watch_images
+
+# Фильтры комбобокса: предикат по статусу строки (None — все строки)
+FILTERS = {
+    "Только НЮ": lambda status: status == "✓",
+    "Только безопасные": lambda status: status == "✗",
+    "Неопределённые": lambda status: status not in ("✓", "✗", "BAD"),
+    "BAD": lambda status: status == "BAD",
+}
+
+TABLE_REFRESH_MS = 50  # перерисовка видимого окна таблицы не чаще, чем раз в столько мс
 
 
 class NSFWAnalyzerApp:
@@ -25,7 +45,9 @@ class NSFWAnalyzerApp:
         self.scan_folder_async = functools.partial(scan_folder_async, self)
         self.initialize_model = functools.partial(initialize_model, self)
         self.analyze_images = functools.partial(analyze_images, self)
+        self.watch_images = functools.partial(watch_images, self)
         self.update_file_list = functools.partial(update_file_list, self)
+        self.sort_table_column = functools.partial(sort_table_column, self)
 
         # Базовые переменные (не блокирующие загрузку)
         self.stop_analysis = False
@@ -36,8 +58,54 @@ class NSFWAnalyzerApp:
         self.libs_loaded = False  # Добавлено
         self.running = True
         self.predict_fn = None  # Добавляем инициализацию атрибута
-
-        self.all_files = []  # Список всех файлов для фильтрации
+        self.load_fn = None
+        self.predict_batch_fn = None
+
+        # Параметры батчевого инференса
+        self.batch_size = BATCH_SIZE
+        self.batch_max_wait = BATCH_MAX_WAIT
+        self.prefetch_size = None  # None — batch_size * PREFETCH_BATCHES
+
+        # Режим выполнения: "threads" — потоки + один батчер, "processes" — пул процессов со своими моделями
+        self.execution_mode = "threads"
+        self.process_workers = None  # None — default_process_workers()
+        self.autotune = True  # потоки декодирования и батч подбираются на первых изображениях (autotune.py)
+
+        # Все файлы папки; в Treeview существуют только видимые строки (см. virtual_table.py)
+        self.file_store = FileStore()
+        self.file_stats = self.file_store  # file_stats.get(путь) -> (st_size, st_mtime_ns) для кэша результатов
+        self.table_refresh_pending = False
+
+        # Обход папки: потоков листинга (>1 — параллельно, для сетевых шар) и детерминированный порядок
+        self.scan_workers = SCAN_WORKERS
+        self.scan_ordered = False
+
+        # Инкрементальный режим: анализ только изменений с прошлого снимка папки (snapshot.py)
+        self.incremental = False
+        self.snapshot_path = None  # None — ~/.nsfw_analyzer/scan_snapshots.sqlite3
+        self.scan_root = None
+        self.scan_delta = None
+
+        # Режим наблюдения: новые файлы в папке анализируются сразу (watcher.py)
+        self.watching = False
+        self.watch_thread = None
+        self.watch_settle = WATCH_SETTLE
+
+        # Постоянный кэш результатов (см. result_cache.py)
+        self.use_cache = True
+        self.cache_path = None  # None — ~/.nsfw_analyzer/results_cache.sqlite3
+        self.result_cache = None
+        self.use_dedup = True  # одинаковые по содержимому файлы анализируются один раз
+
+        # Ансамбль: модели через " + " в названии, оценки объединяются ensemble_combiner
+        self.ensemble_combiner = DEFAULT_COMBINER
+        self.ensemble_weights = None  # для "weighted"; None — равные веса
+        # Каскад: модели через " > ", вторая проверяет только оценки в пределах порог ± cascade_band
+        self.cascade_band = CASCADE_BAND
+        self.verbose_timing = True  # строка лога «⏱ Обработка ...» на каждый файл
+        self.timings_path = TIMINGS_PATH  # время стадий последнего анализа (stage_timing.py)
+        # Загруженные модели остаются в памяти (model_registry) в пределах этого бюджета
+        self.model_cache_mb = MODEL_CACHE_MB
 
         # Создание интерфейса
         self.create_widgets()
@@ -88,13 +156,9 @@ class NSFWAnalyzerApp:
 
     def initialize_backend(self):
         """Инициализирует тяжелые компоненты в фоне"""
-        # Проверка GPU/CPU
-        import tensorflow as tf
-        devices = tf.config.list_physical_devices()
-        self.image_queue.put(("log", f"Доступные устройства: {devices}\n"))
-
-        # Ленивая загрузка модели при первом анализе
-        # self.image_queue.put(("log", "Модель будет загружена при первом анализе\n"))
+        # TensorFlow и устройства GPU/CPU загружаются вместе с моделью при первом анализе
+        # (analyzer.initialize_model), чтобы не тормозить запуск окна
+        self.image_queue.put(("log", "Модель будет загружена при первом анализе\n"))
 
         # Обновляем статус
         self.image_queue.put(("status", "Готов к работе"))
@@ -174,32 +238,55 @@ class NSFWAnalyzerApp:
         self.model_combobox = ttk.Combobox(
             self.control_frame,
             textvariable=self.model_type,
-            values=["Yahoo NSFW", "MobileNetV2", "GantMan NSFW", "NSFW Hub Detector", "TF Hub Detector"],
+            values=["Yahoo NSFW", "MobileNetV2", "GantMan NSFW", "NSFW Hub Detector", "TF Hub Detector",
+                    "Yahoo NSFW + GantMan NSFW", "Yahoo NSFW > GantMan NSFW"],
             state="readonly",
             width=15
         )
         self.model_combobox.grid(row=0, column=10, padx=5)
 
-        # Таблица результатов
-        self.tree_frame = tk.Frame(self.left_paned)
-        self.left_paned.add(self.tree_frame, height=500)
+        # Объединение оценок, если выбран ансамбль моделей (ensemble.py)
+        self.combiner_var = tk.StringVar(value=DEFAULT_COMBINER)
+        self.combiner_combobox = ttk.Combobox(
+            self.control_frame,
+            textvariable=self.combiner_var,
+            values=list(COMBINERS),
+            state="readonly",
+            width=8
+        )
+        self.combiner_combobox.bind("<<ComboboxSelected>>", self.set_combiner)
+        self.combiner_combobox.grid(row=0, column=14, padx=5)
 
-        self.tree_scroll_y = ttk.Scrollbar(self.tree_frame)
-        self.tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.process_mode_var = tk.BooleanVar(value=False)
+        self.process_mode_check = tk.Checkbutton(
+            self.control_frame,
+            text="Процессы",
+            variable=self.process_mode_var,
+            command=lambda: setattr(self, "execution_mode",
+                                    "processes" if self.process_mode_var.get() else "threads")
+        )
+        self.process_mode_check.grid(row=0, column=11, padx=5)
 
-        self.tree_scroll_x = ttk.Scrollbar(self.tree_frame, orient=tk.HORIZONTAL)
-        self.tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.incremental_check = tk.Checkbutton(
+            self.control_frame,
+            text="Только изменения",
+            variable=self.incremental_var,
+            command=lambda: setattr(self, "incremental", self.incremental_var.get())
+        )
+        self.incremental_check.grid(row=0, column=12, padx=5)
 
-        self.result_tree = ttk.Treeview(self.tree_frame,
-                                        columns=("#", "Имя файла", "Путь", "Размер", "Дата изменения", "Порог", "Статус"),
-                                        show="headings",
-                                        yscrollcommand=self.tree_scroll_y.set,
-                                        xscrollcommand=self.tree_scroll_x.set)
+        self.watch_button = tk.Button(self.control_frame, text="Наблюдать", command=self.toggle_watch)
+        self.watch_button.grid(row=0, column=13, padx=5)
 
-        self.result_tree.pack(fill=tk.BOTH, expand=True)
+        # Таблица результатов
+        self.tree_frame = tk.Frame(self.left_paned)
+        self.left_paned.add(self.tree_frame, height=500)
 
-        self.tree_scroll_y.config(command=self.result_tree.yview)
-        self.tree_scroll_x.config(command=self.result_tree.xview)
+        self.table = VirtualTable(self.tree_frame, self.file_store, COLUMNS,
+                                  on_select=self.show_preview, on_sort=self.sort_table_column)
+        self.table.pack(fill=tk.BOTH, expand=True)
+        self.result_tree = self.table.tree
 
         # Настройка столбцов
         columns = {
@@ -212,24 +299,41 @@ class NSFWAnalyzerApp:
             "Статус": {"width": 60, "anchor": "center"}
         }
 
-        # for col, params in columns.items():
-        #     self.result_tree.heading(col, text=col)
-        #     self.result_tree.column(col, **params)
-
         for col, params in columns.items():
-            self.result_tree.heading(col, text=col,
-                                     command=lambda c=col: self.sort_treeview_column(c, False))
             self.result_tree.column(col, **params)
 
-        # Теги для подсветки
-        self.result_tree.tag_configure('nude', background='#ffcccc')
-        self.result_tree.tag_configure('safe', background='#ccffcc')
-
         # Консоль логов
         self.log_frame = tk.LabelFrame(self.left_paned, text="Лог")
         self.left_paned.add(self.log_frame, height=200)
 
-        self.log_console = scrolledtext.ScrolledText(self.log_frame)
+        self.log_toolbar = tk.Frame(self.log_frame)
+        self.log_toolbar.pack(fill=tk.X)
+        tk.Label(self.log_toolbar, text="Показывать:").pack(side=tk.LEFT, padx=5)
+        self.log_filter_var = tk.StringVar(value="Все")
+        self.log_filter_combobox = ttk.Combobox(
+            self.log_toolbar,
+            textvariable=self.log_filter_var,
+            values=list(LOG_FILTERS),
+            state="readonly",
+            width=15
+        )
+        self.log_filter_combobox.bind("<<ComboboxSelected>>",
+                                      lambda _: self.log_console.set_filter(self.log_filter_var.get()))
+        self.log_filter_combobox.pack(side=tk.LEFT, padx=5)
+        # Строка лога на каждый файл: при больших прогонах её можно отключить, ошибки пишутся всегда
+        self.verbose_timing_var = tk.BooleanVar(value=True)
+        self.verbose_timing_check = tk.Checkbutton(
+            self.log_toolbar,
+            text="Время по каждому файлу",
+            variable=self.verbose_timing_var,
+            command=lambda: setattr(self, "verbose_timing", self.verbose_timing_var.get())
+        )
+        self.verbose_timing_check.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.log_toolbar, text="Очистить",
+                  command=lambda: self.log_console.clear()).pack(side=tk.LEFT, padx=5)
+
+        # Хранит не больше LOG_CONSOLE_LINES строк (log_console.py)
+        self.log_console = LogConsole(self.log_frame)
         self.log_console.pack(fill=tk.BOTH, expand=True)
 
         # # Превью изображения
@@ -270,7 +374,6 @@ class NSFWAnalyzerApp:
 
         # Привязка событий
         self.result_tree.bind("<Double-1>", self.open_image)
-        self.result_tree.bind("<<TreeviewSelect>>", self.show_preview)
         self.filter_var.trace_add('write', self.apply_filter)
 
         # Enter – открыть изображение
@@ -285,22 +388,38 @@ class NSFWAnalyzerApp:
         self.result_tree.tag_configure('nude', background='#ffcccc')
         self.result_tree.tag_configure('safe', background='#ccffcc')
 
+    # ---------------------- СТРОКИ ТАБЛИЦЫ ----------------------
+    def add_files(self, entries):
+        """Добавляет найденные сканером файлы [(путь, st_size, st_mtime_ns, inode), ...]"""
+        self.file_store.add_many(entries)
+        self.schedule_table_refresh()
+
+    def schedule_table_refresh(self):
+        """Перерисовка видимого окна таблицы не чаще раза в TABLE_REFRESH_MS"""
+        if self.table_refresh_pending:
+            return
+        self.table_refresh_pending = True
+
+        def refresh():
+            self.table_refresh_pending = False
+            self.table.refresh()
+
+        self.root.after(TABLE_REFRESH_MS, refresh)
+
+    def rename_row(self, row_id, new_path):
+        """Обновляет путь после перемещения файла"""
+        self.file_store.rename(row_id, new_path)
+
+    def forget_row(self, row_id):
+        """Убирает удалённый файл из таблицы"""
+        self.file_store.remove(row_id)
+        self.table.forget(row_id)
+
     def mark_bad_file(self, img_path):
-        # Находим item в Treeview
-        for item in self.result_tree.get_children():
-            values = list(self.result_tree.item(item)['values'])
-            if values[2] == img_path:
-                # Обновляем в Treeview
-                self.result_tree.set(item, "НЮ", "BAD")
-                self.result_tree.item(item, tags=("bad",))
-                # Обновляем в all_files
-                for i, f in enumerate(self.all_files):
-                    if f[2] == img_path:
-                        updated = list(f)
-                        updated[6] = "BAD"
-                        self.all_files[i] = tuple(updated)
-                        break
-                break
+        row_id = self.file_store.row_id(img_path)
+        if row_id is not None:
+            self.file_store.set_result(row_id, 0.0, "BAD")
+            self.schedule_table_refresh()
 
     def move_selected_file_by_filter(self, event=None):
         folder_path = self.path_entry.get()
@@ -316,7 +435,7 @@ class NSFWAnalyzerApp:
             messagebox.showinfo("Инфо", "Перемещение доступно только для фильтров 'Только НЮ' и 'Неопределённые'")
             return
 
-        selected = self.result_tree.selection()
+        selected = self.table.selected_rows()
         if not selected:
             return  # ничего не выбрано
 
@@ -324,10 +443,9 @@ class NSFWAnalyzerApp:
         os.makedirs(target_folder, exist_ok=True)
 
         moved_count = 0
-        for item in selected:
-            values = self.result_tree.item(item)['values']
-            img_path = values[2]
-            nude_status = str(values[6]).strip()
+        for row_id in selected:
+            img_path = self.file_store.path(row_id)
+            nude_status = self.file_store.status(row_id)
 
             # проверяем статус по фильтру
             if filter_type == "Только НЮ" and nude_status != "✓":
@@ -341,26 +459,28 @@ class NSFWAnalyzerApp:
                 os.makedirs(os.path.dirname(dst_path), exist_ok=True)
                 os.rename(img_path, dst_path)
                 log_message(f"[MOVE ONE] {img_path} -> {dst_path}\n", self.log_console)
-                self.result_tree.set(item, "Путь", dst_path)
+                self.rename_row(row_id, dst_path)
                 moved_count += 1
             except Exception as e:
                 log_message(f"[ERROR MOVE ONE] {img_path}: {e}\n", self.log_console)
 
         if moved_count > 0:
+            self.table.refresh()
             self.status_var.set(f"Перемещён {moved_count} файл(ов) в {target_folder}")
 
     def delete_selected_file(self, event=None):
-        selected = self.result_tree.selection()
+        selected = self.table.selected_rows()
         if not selected:
             return
-        for item in selected:
-            img_path = self.result_tree.item(item)['values'][2]
+        for row_id in selected:
+            img_path = self.file_store.path(row_id)
             try:
                 os.remove(img_path)
                 log_message(f"[DELETE] {img_path}\n", self.log_console)
-                self.result_tree.delete(item)
+                self.forget_row(row_id)
             except Exception as e:
                 log_message(f"[ERROR DELETE] {img_path}: {e}\n", self.log_console)
+        self.table.refresh()
 
     def move_images_by_filter(self, *_):
         folder_path = self.path_entry.get()
@@ -380,10 +500,8 @@ class NSFWAnalyzerApp:
         os.makedirs(target_folder, exist_ok=True)
 
         moved_count = 0
-        for item in self.result_tree.get_children():
-            values = self.result_tree.item(item)['values']
-            img_path = values[2]
-            nude_status = str(values[6]).strip()
+        for row_id, img_path in self.file_store.jobs():
+            nude_status = self.file_store.status(row_id)
             # Логика отбора по фильтру
             if filter_type == "Только НЮ" and nude_status != "✓":
                 continue
@@ -396,11 +514,12 @@ class NSFWAnalyzerApp:
                 os.makedirs(os.path.dirname(dst_path), exist_ok=True)
                 os.rename(img_path, dst_path)
                 log_message(f"[MOVE] {img_path} -> {dst_path}\n", self.log_console)
-                self.result_tree.set(item, "Путь", dst_path)
+                self.rename_row(row_id, dst_path)
                 moved_count += 1
             except Exception as e:
                 log_message(f"[ERROR MOVE] {img_path}: {e}\n", self.log_console)
 
+        self.table.refresh()
         self.status_var.set(f"Перемещено {moved_count} файлов в {target_folder}")
         messagebox.showinfo("Готово", f"Перемещено {moved_count} файлов")
 
@@ -441,10 +560,11 @@ class NSFWAnalyzerApp:
             return
 
         # Очищаем предыдущие результаты
-        self.result_tree.delete(*self.result_tree.get_children())
+        self.file_store.clear()
+        self.table.reset()
         self.path_entry.delete(0, tk.END)
         self.path_entry.insert(0, folder_path)
-        self.all_files.clear()
+        self.stop_analysis = False  # флаг мог остаться после остановленного анализа
 
         # Запускаем сканирование в отдельном потоке
         threading.Thread(
@@ -453,41 +573,40 @@ class NSFWAnalyzerApp:
             daemon=True
         ).start()
 
-    def load_images_from_folder(self, folder_path):
-        self.result_tree.delete(*self.result_tree.get_children())
-        if not folder_path:
-            return
-
-        supported_formats = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-        file_count = 0
-
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(supported_formats):
-                    file_count += 1
-                    img_path = os.path.join(root, file)
-                    stat = os.stat(img_path)
-                    size = self.convert_size(stat.st_size)
-                    mtime = datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
-
-                    self.result_tree.insert("", "end", values=(
-                        file_count,
-                        os.path.basename(img_path),
-                        img_path,
-                        size,
-                        mtime,
-                        "",  # Для порога
-                        ""  # Для статуса НЮ
-                    ))
-
-        self.status_var.set(f"Загружено {file_count} изображений")
-
     def toggle_analysis(self):
         if self.analyze_button['text'] == 'Анализировать':
             self.start_analysis()
         else:
             self.stop_analysis = True
 
+    def set_combiner(self, *_):
+        """Другой способ объединения меняет итоговые оценки — ансамбль инициализируется заново"""
+        self.ensemble_combiner = self.combiner_var.get()
+        if is_ensemble(getattr(self, "model_name", "")):
+            self.predict_batch_fn = None  # ensure_model пересоберёт ансамбль перед анализом
+
+    def toggle_watch(self):
+        if self.watching:
+            self.watching = False
+            self.watch_button.config(state=tk.DISABLED)  # до сообщения "watch_stopped"
+            return
+
+        folder_path = self.path_entry.get()
+        if not folder_path or not os.path.isdir(folder_path):
+            messagebox.showerror("Ошибка", "Выберите папку для наблюдения")
+            return
+        if self.analysis_thread and self.analysis_thread.is_alive():
+            messagebox.showinfo("Инфо", "Дождитесь окончания анализа")
+            return
+
+        self.watching = True
+        self.stop_analysis = False
+        self.watch_button.config(text="Остановить наблюдение")
+        self.analyze_button.config(state=tk.DISABLED)
+        self.status_var.set("👁 Наблюдение за папкой...")
+        self.watch_thread = threading.Thread(target=self.watch_images, args=(folder_path,), daemon=True)
+        self.watch_thread.start()
+
     def start_analysis(self):
         if not self.path_entry.get():
             messagebox.showerror("Ошибка", "Выберите папку для анализа")
@@ -515,151 +634,110 @@ class NSFWAnalyzerApp:
         self.analysis_thread.start()
 
     def process_queue(self):
+        """Разбирает очередь не дольше FRAME_BUDGET_MS за тик: лог вставляется одним куском,
+        из статусов и прогресса применяется только последний"""
         if not getattr(self, "running", True):
             return
 
+        deadline = time.perf_counter() + FRAME_BUDGET_MS / 1000.0
+        log_chunks = []
+        status = None
+        progress = None
+        table_changed = False
+
         try:
-            while True:
+            while time.perf_counter() < deadline:
                 task = self.image_queue.get_nowait()
 
                 if isinstance(task, tuple):
-                    if task[0] == "update_item":
-                        item_id = task[1]
-                        values = task[2]
-
-                        # Получаем путь до обновления
-                        try:
-                            tree_values = list(self.result_tree.item(item_id, "values"))
-                            path = tree_values[2]
-                        except Exception:
-                            continue  # строка не найдена
-
-                        # Обновляем Treeview
-                        if self.result_tree.winfo_exists():
-                            for col, val in values.items():
-                                try:
-                                    if col == "tag":
-                                        self.result_tree.item(item_id, tags=(val,))
-                                    else:
-                                        self.result_tree.set(item_id, col, val)
-                                except tk.TclError:
-                                    continue  # удалена строка
-
-                        # Получаем обновлённые значения после вставки
-                        try:
-                            updated_values = list(self.result_tree.item(item_id, "values"))
-                        except Exception:
-                            continue
-
-                        # Обновляем all_files
-                        for i, file_data in enumerate(self.all_files):
-                            if file_data[2] == path:
-                                self.all_files[i] = updated_values
-                                break
+                    if task[0] == "update_batch":
+                        _, updates, logs, processed, total = task
+                        for row_id, (score, status, models) in updates:
+                            self.file_store.set_result(row_id, score, status, models)
+                        table_changed = True
+                        if logs:
+                            log_chunks.append(logs)
+                        if total is None:
+                            status = f"👁 Наблюдение: проанализировано {processed}"
+                        else:
+                            status = f"Анализ изображений... ({processed} / {total})"
+                            progress = processed
 
                     elif task[0] == "log":
-                        if self.log_console.winfo_exists():
-                            try:
-                                self.log_console.insert(tk.END, task[1])
-                                self.log_console.see(tk.END)
-                            except tk.TclError:
-                                pass
+                        log_chunks.append(task[1])
 
                     elif task[0] == "status":
-                        self.status_var.set(task[1])
+                        status = task[1]
+
+                    elif task[0] == "scan_progress":
+                        # Общее число файлов ещё неизвестно — шкала по текущей оценке
+                        _, found, estimate = task
+                        self.progress["maximum"] = max(estimate, found, 1)
+                        progress = found
+                        status = f"Сканирование... ({found} из ~{estimate})"
 
                     elif task[0] == "scan_complete":
                         file_count = task[1]
-                        self.status_var.set(f"Загружено {file_count} изображений. Готов к анализу")
+                        status = f"Загружено {file_count} изображений. Готов к анализу"
                         self.progress.stop()
+                        self.progress["maximum"] = max(file_count, 1)
+                        progress = file_count
                         self.analyze_button.config(state=tk.NORMAL)
 
                     elif task[0] == "analysis_complete":
                         self.analyze_button.config(text="Анализировать", state=tk.NORMAL)
                         self.move_button.config(state=tk.NORMAL)
 
+                    elif task[0] == "watch_stopped":
+                        self.watching = False
+                        status = "Наблюдение остановлено"
+                        self.watch_button.config(text="Наблюдать", state=tk.NORMAL)
+                        self.analyze_button.config(state=tk.NORMAL)
+
                     elif task[0] == "progress":
-                        current = task[1]
-                        self.progress["value"] = current
-                        self.progress.update()
+                        progress = task[1]
 
                     elif task[0] == "mark_bad":
                         bad_path = task[1]
                         self.mark_bad_file(bad_path)
 
-
         except queue.Empty:
             pass
 
-        if self.running:
-            self.root.after(100, self.process_queue)
-
-    def apply_filter2(self, *args):
-        if getattr(self, "analysis_running", False):
-            messagebox.showwarning("Анализ", "Нельзя менять фильтр во время анализа.")
-            return
-
-        filter_type = self.filter_var.get()
-
-        # Очищаем текущее отображение
-        self.result_tree.delete(*self.result_tree.get_children())
+        # Сообщения log_message из рабочих потоков (log_writer.ConsoleMailbox)
+        posted = CONSOLE_MAILBOX.take(self.log_console)
+        if posted:
+            log_chunks.append(posted)
 
-        # Отображаем подходящие строки
-        for file_data in self.all_files:
-            nude_status = str(file_data[6]).strip()
-
-            if filter_type == "Только НЮ" and nude_status != "✓":
-                continue
-            elif filter_type == "Только безопасные" and nude_status != "✗":
-                continue
-            elif filter_type == "Неопределённые" and nude_status in ("✓", "✗"):
-                continue
-
-            self.result_tree.insert("", "end", values=file_data)
+        if log_chunks and self.log_console.winfo_exists():
+            try:
+                self.log_console.append("".join(log_chunks))
+            except tk.TclError:
+                pass
+        if status is not None:
+            self.status_var.set(status)
+        if progress is not None:
+            self.progress["value"] = progress
+        if table_changed:
+            self.schedule_table_refresh()
 
-        self.update_highlighting()
+        if self.running:
+            # Не успели разобрать очередь за бюджет — продолжаем на следующем тике, не дожидаясь паузы
+            self.root.after(BUSY_TICK_MS if not self.image_queue.empty() else IDLE_TICK_MS, self.process_queue)
 
     def apply_filter(self, *args):
         if getattr(self, "analysis_running", False):
             messagebox.showwarning("Анализ", "Нельзя менять фильтр во время анализа.")
             return
 
-        filter_type = self.filter_var.get()
-        self.result_tree.delete(*self.result_tree.get_children())
-
-        for file_data in self.all_files:
-            nude_status = str(file_data[6]).strip()
-
-            if filter_type == "Только НЮ" and nude_status != "✓":
-                continue
-            elif filter_type == "Только безопасные" and nude_status != "✗":
-                continue
-            elif filter_type == "Неопределённые" and nude_status in ("✓", "✗", "BAD"):
-                continue
-            elif filter_type == "BAD" and nude_status != "BAD":  # 👈 новый фильтр
-                continue
-
-            self.result_tree.insert("", "end", values=file_data)
-
-        self.update_highlighting()
-
-    def restore_all_items(self):
-        """Восстанавливает все элементы в Treeview"""
-        children = self.result_tree.get_children()
-        for item in children:
-            self.result_tree.reattach(item, '', 'end')
-
-    def update_highlighting(self):
-        """Обновляет подсветку всех видимых элементов"""
-        for item in self.result_tree.get_children():
-            nude_status = self.result_tree.set(item, "Статус")
-            tags = ('nude',) if nude_status == "✓" else ('safe',) if nude_status == "✗" else ()
-            self.result_tree.item(item, tags=tags)
+        # Перестраивается только список row_id; в Treeview попадёт лишь видимое окно
+        self.file_store.set_filter(FILTERS.get(self.filter_var.get()))
+        self.table.reset()
 
     def open_image(self, event):
-        selected_item = self.result_tree.selection()
-        if selected_item:
-            img_path = self.result_tree.item(selected_item[0])['values'][2]
+        row_id = self.table.current_row()
+        if row_id is not None:
+            img_path = self.file_store.path(row_id)
             try:
                 if sys.platform.startswith('win'):
                     os.startfile(img_path)
@@ -672,11 +750,14 @@ class NSFWAnalyzerApp:
 
     def show_preview(self, event=None):
         # получаем выбранный элемент
-        selected = self.result_tree.selection()
-        if not selected:
+        row_id = self.table.current_row()
+        if row_id is None:
             return
-        item = selected[0]
-        img_path = self.result_tree.item(item)['values'][2]
+        img_path = self.file_store.path(row_id)
+        models = self.file_store.models(row_id)
+        if models:
+            # Оценки моделей ансамбля и каскада — в строке статуса, лог мог их уже не хранить
+            self.status_var.set(" | ".join(f"{name} {score:.4f}" for name, score in models.items()))
 
         # сохраняем путь, чтобы не терять при ресайзе (если вдруг понадобится)
         self._last_preview_path = img_path
@@ -717,12 +798,8 @@ class NSFWAnalyzerApp:
         self.stop_analysis = True
 
         # Выгружаем модели из памяти
-        if hasattr(self, 'n2'):
-            del self.n2
-        if hasattr(self, 'mobilenet_model'):
-            del self.mobilenet_model
-        if hasattr(self, 'tfhub_model'):
-            del self.tfhub_model
+        self.model = None
+        MODEL_REGISTRY.clear()
 
         self.running = False  # останавливает process_queue
         self.stop_analysis = True  # остановить анализ
@@ -735,6 +812,16 @@ class NSFWAnalyzerApp:
         if self.analysis_thread and self.analysis_thread.is_alive():
             print("⏳ Ожидаем завершение анализа...")
             self.analysis_thread.join(timeout=3)
+        self.watching = False
+        if self.watch_thread and self.watch_thread.is_alive():
+            self.watch_thread.join(timeout=3)
+
+        # Сбрасываем накопленные результаты в кэш
+        if self.result_cache is not None:
+            try:
+                self.result_cache.close()
+            except Exception as e:
+                print(f"Ошибка закрытия кэша: {e}")
 
         # Теперь можно безопасно уничтожить окно
         self.root.destroy()
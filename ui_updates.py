@@ -0,0 +1,62 @@
+import threading
+
+# Сторона воркеров: результаты копятся и уходят в очередь UI одним сообщением
+COALESCE_MAX_ITEMS = 200  # не больше строк в одном сообщении "update_batch"
+COALESCE_INTERVAL = 0.1  # и не реже, чем раз в столько секунд
+
+# Сторона UI: сколько времени один тик process_queue может тратить на применение обновлений
+FRAME_BUDGET_MS = 30
+BUSY_TICK_MS = 1  # очередь не разобрана — следующий тик сразу
+IDLE_TICK_MS = 50
+
+
+class UpdateCoalescer:
+    """Собирает результаты анализа из разных потоков в пакетные сообщения для process_queue.
+
+    Вместо update_item / log / status / progress на каждое изображение в очередь попадает
+    ("update_batch", [(item, (score, статус, оценки моделей или None)), ...], текст лога, обработано, всего).
+    total=None — общее число заранее неизвестно (режим наблюдения).
+    """
+
+    def __init__(self, image_queue, total, max_items=COALESCE_MAX_ITEMS, interval=COALESCE_INTERVAL):
+        self.image_queue = image_queue
+        self.total = total
+        self.max_items = max_items
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.updates = []
+        self.logs = []
+        self.processed = 0
+
+        # Фоновый сброс, чтобы последние результаты не зависали, когда поток результатов редкий
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.thread.start()
+
+    def add(self, item, values, log_line):
+        with self.lock:
+            self.updates.append((item, values))
+            if log_line:
+                self.logs.append(log_line)
+            self.processed += 1
+            if len(self.updates) >= self.max_items:
+                self._flush_locked()
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.updates and not self.logs:
+            return
+        self.image_queue.put(("update_batch", self.updates, "".join(self.logs), self.processed, self.total))
+        self.updates = []
+        self.logs = []
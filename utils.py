@@ -1,5 +1,8 @@
+import math
 import os
-import tkinter as tk
+import threading
+
+from log_writer import CONSOLE_MAILBOX, LOG_WRITER
 
 
 def convert_size(size_bytes):
@@ -12,42 +15,70 @@ def convert_size(size_bytes):
 
 
 def get_cpu_cores():
-    """Возвращает количество доступных логических ядер"""
-    import multiprocessing
-    return multiprocessing.cpu_count()
+    """Ядра, реально доступные процессу: с учётом привязки к CPU (affinity) и квоты cgroup в контейнерах.
+
+    multiprocessing.cpu_count() возвращает все ядра машины, даже если контейнеру выделено два.
+    """
     try:
-        return os.cpu_count() or 4
-    except Exception:
-        return 4  # fallback
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):  # Windows, macOS
+        cores = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, math.ceil(quota))
+    return max(1, cores)
 
 
-def log_message(message, console=None):
-    if console:
-        console.insert(tk.END, message)
-        console.see(tk.END)
-        console.update()
+def cgroup_cpu_quota():
+    """Квота CPU cgroup в ядрах (1.5 — полтора ядра) или None, если квоты нет"""
+    # cgroup v2: "<квота> <период>" или "max <период>" в cpu.max своей группы (в контейнере — корень)
+    paths = ["/sys/fs/cgroup/cpu.max"]
     try:
-        with open("analyzer_nu.log", "a", encoding="utf-8") as f:
-            f.write(message)
-    except Exception as e:
-        print(f"[Ошибка записи в лог-файл] {e}")
-    print(message.strip())  # Вывод в консоль Python
-
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    paths.insert(0, os.path.join("/sys/fs/cgroup", line[3:].strip().lstrip("/"), "cpu.max"))
+    except OSError:
+        pass
+    for path in paths:
+        try:
+            with open(path) as f:
+                quota, period = f.read().split()[:2]
+        except (OSError, ValueError):
+            continue
+        return None if quota == "max" else int(quota) / int(period)
 
-def sort_treeview_column(self, col, reverse):
-    data = [(self.result_tree.set(k, col), k) for k in self.result_tree.get_children('')]
+    # cgroup v1: cpu.cfs_quota_us = -1 — без ограничения
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
 
-    # Преобразуем значения для числовых и текстовых столбцов
-    def convert(value):
-        try:
-            return float(value.replace(",", "."))
-        except:
-            return value.lower()  # текст сравниваем нечувствительно к регистру
 
-    data.sort(key=lambda t: convert(t[0]), reverse=reverse)
+def log_message(message, console=None):
+    # "end" == tk.END: utils не импортирует tkinter, чтобы работать в CLI без Tk
+    if console:
+        if threading.current_thread() is threading.main_thread():
+            append = getattr(console, "append", None)  # log_console.LogConsole ограничивает историю
+            if append is not None:
+                append(message)
+            else:
+                console.insert("end", message)
+                console.see("end")
+            console.update()
+        else:
+            CONSOLE_MAILBOX.post(console, message)  # Tk — только из главного потока (process_queue)
+    LOG_WRITER.write(message)  # файл пишется фоновым потоком (log_writer.py)
+    print(message.strip())  # Вывод в консоль Python
 
-    for index, (_, k) in enumerate(data):
-        self.result_tree.move(k, '', index)
 
-    # Перепривязка заголовка для смены направления
-    self.result_tree.heading(col, command=lambda: self.sort_treeview_column(col, not reverse))
+def sort_table_column(self, col):
+    """Сортирует таблицу по столбцу; повторный клик по тому же столбцу меняет направление"""
+    store = self.file_store
+    reverse = not store.sort_reverse if store.sort_column == col else False
+    store.sort(col, reverse)
+    self.table.reset()
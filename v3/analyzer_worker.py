@@ -9,8 +9,8 @@ from concurrent.futures import ThreadPoolExecutor
 
 import tensorflow as tf
 import keras
-from PIL import Image
 
+from preprocessing import GANTMAN_SPEC, MOBILENET_SPEC, NSFW_HUB_SPEC, make_loader
 from utils import get_cpu_cores, log_message, convert_size
 
 
@@ -34,13 +34,9 @@ class AnalyzerWorker:
         self.supported_formats = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
 
     # ----------------------------- ПРЕДОБРАБОТКА -----------------------------
-    def load_and_preprocess(self, path, target_size=(224, 224)):
-        """Ускоренная загрузка через Pillow с draft для экономии времени"""
-        img = Image.open(path)
-        img.draft("RGB", target_size)
-        img = img.convert("RGB")
-        img = img.resize(target_size, Image.BILINEAR)
-        return tf.convert_to_tensor(img, dtype=tf.float32) / 255.0
+    def load_and_preprocess(self, path, spec=GANTMAN_SPEC):
+        """Общая предобработка (preprocessing): JPEG через draft, нормализация по входу модели"""
+        return tf.convert_to_tensor(make_loader(spec)(path))
 
     # ----------------------------- ИНИЦИАЛИЗАЦИЯ МОДЕЛЕЙ -----------------------------
     def initialize_model(self, model_name: str):
@@ -124,20 +120,12 @@ class AnalyzerWorker:
         return float(max(scores[1], scores[3], scores[4]))
 
     def _predict_mobilenet(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = self.preprocess_input(img)
-        img = tf.expand_dims(img, axis=0)
+        img = tf.expand_dims(self.load_and_preprocess(img_path, MOBILENET_SPEC), axis=0)
         predictions = self.model.predict(img)
         return float(predictions[0][0])
 
     def _predict_nsfw_hub(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = tf.cast(img, tf.float32) / 255.0
-        img = tf.expand_dims(img, axis=0)
+        img = tf.expand_dims(self.load_and_preprocess(img_path, NSFW_HUB_SPEC), axis=0)
         preds = self.model(img).numpy()[0]
         return float(max(preds[1], preds[3], preds[4]))
 
@@ -7,6 +7,9 @@ import keras
 from utils import log_message
 import threading
 from PIL import Image
+import numpy as np
+
+from preprocessing import GANTMAN_SPEC, MOBILENET_SPEC, NSFW_HUB_SPEC, TF_HUB_SPEC, make_loader
 
 class ModelManager:
     def __init__(self, log_console=None):
@@ -42,6 +45,11 @@ class ModelManager:
             raise RuntimeError("Модель не инициализирована")
         return self.predict_fn(img_path)
 
+    @staticmethod
+    def _input(img_path, spec):
+        """Батч из одного изображения по входу модели (общая предобработка preprocessing)"""
+        return np.expand_dims(make_loader(spec)(img_path), 0)
+
     # ================= ИНИЦИАЛИЗАЦИИ =================
     def _init_yahoo(self):
         import opennsfw2
@@ -50,19 +58,13 @@ class ModelManager:
         log_message("[Yahoo] ✅ Модель готова к работе\n", self.log_console)
 
     def _init_mobilenet(self):
-        from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
         log_message("[MobileNetV2] Загрузка модели...\n", self.log_console)
         self.model = tf.keras.applications.MobileNetV2(weights='imagenet')
-        self.predict_fn = lambda path: self._predict_mobilenet(path, preprocess_input)
+        self.predict_fn = self._predict_mobilenet
         log_message("[MobileNetV2] ✅ Модель готова к работе\n", self.log_console)
 
-    def _predict_mobilenet(self, img_path, preprocess_input):
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = preprocess_input(img)
-        img = tf.expand_dims(img, axis=0)
-        predictions = self.model.predict(img)
+    def _predict_mobilenet(self, img_path):
+        predictions = self.model.predict(self._input(img_path, MOBILENET_SPEC))
         return float(predictions[0][0])
 
     def _init_nsfw_hub(self):
@@ -70,12 +72,7 @@ class ModelManager:
         log_message("[NSFW Hub] Загрузка модели...\n", self.log_console)
         self.model = hub.load("https://tfhub.dev/GourmetAI/nsfw_classifier/1")
         def _predict(path):
-            img = tf.io.read_file(path)
-            img = tf.image.decode_jpeg(img, channels=3)
-            img = tf.image.resize(img, [224, 224])
-            img = tf.cast(img, tf.float32) / 255.0
-            img = tf.expand_dims(img, axis=0)
-            preds = self.model(img).numpy()[0]
+            preds = self.model(self._input(path, NSFW_HUB_SPEC)).numpy()[0]
             return max(preds[1], preds[3], preds[4])
         self.predict_fn = _predict
         log_message("[NSFW Hub] ✅ Модель готова к работе\n", self.log_console)
@@ -108,12 +105,7 @@ class ModelManager:
             log_message("✅ [GantMan] Модель готова к работе\n", self.log_console)
 
     def _predict_gantman(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = tf.cast(img, tf.float32) / 255.0
-        img = tf.expand_dims(img, 0)
-        outputs = self.model(img)
+        outputs = self.model(self._input(img_path, GANTMAN_SPEC))
         if isinstance(outputs, dict):
             scores = list(outputs.values())[0].numpy()[0]
         else:
@@ -125,10 +117,6 @@ class ModelManager:
         log_message("[TF Hub] Загрузка модели...\n", self.log_console)
         self.model = hub.load("https://tfhub.dev/google/openimages/v4/ssd/mobilenetv2/classification/4")
         def _predict(path):
-            img = tf.io.read_file(path)
-            img = tf.image.decode_jpeg(img, channels=3)
-            img = tf.image.resize(img, [224, 224])
-            img = tf.expand_dims(img, axis=0)
-            return float(self.model(img).numpy()[0][1])
+            return float(self.model(self._input(path, TF_HUB_SPEC)).numpy()[0][1])
         self.predict_fn = _predict
         log_message("[TF Hub] ✅ Модель готова к работе\n", self.log_console)
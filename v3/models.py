@@ -3,13 +3,22 @@ import tensorflow as tf
 import opennsfw2
 import urllib.request, zipfile, shutil, os
 import keras
+import numpy as np
 import tensorflow_hub as hub
 
+from preprocessing import GANTMAN_SPEC, MOBILENET_SPEC, NSFW_HUB_SPEC, TF_HUB_SPEC, make_loader
+
 # ------------------ Base Class ------------------
 class BaseNSFWModel:
+    input_spec = None  # preprocessing.InputSpec: размер и нормализация входа модели
+
     def load(self):
         raise NotImplementedError
 
+    def preprocess(self, img_path: str):
+        """Батч из одного изображения по input_spec (общая предобработка с основным приложением)"""
+        return np.expand_dims(make_loader(self.input_spec)(img_path), 0)
+
     def predict(self, img_path: str) -> float:
         raise NotImplementedError
 
@@ -23,6 +32,8 @@ class YahooModel(BaseNSFWModel):
 
 # ------------------ Gantman Model ------------------
 class GantmanModel(BaseNSFWModel):
+    input_spec = GANTMAN_SPEC
+
     def load(self):
         model_dir = "nsfw_model_mobilenet_v2"
         saved_model_path = os.path.join(model_dir, "mobilenet_v2_140_224")
@@ -46,56 +57,41 @@ class GantmanModel(BaseNSFWModel):
         self.model = keras.layers.TFSMLayer(saved_model_path, call_endpoint='serving_default')
 
     def predict(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = tf.cast(img, tf.float32) / 255.0
-        img = tf.expand_dims(img, 0)
-        outputs = self.model(img)
+        outputs = self.model(self.preprocess(img_path))
         scores = list(outputs.values())[0].numpy()[0] if isinstance(outputs, dict) else outputs.numpy()[0]
         return float(max(scores[1], scores[3], scores[4]))
 
 # ------------------ MobileNet Model ------------------
 class MobileNetModel(BaseNSFWModel):
+    input_spec = MOBILENET_SPEC
+
     def load(self):
-        from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
         self.model = tf.keras.applications.MobileNetV2(weights='imagenet')
-        self.preprocess_input = preprocess_input
 
     def predict(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = self.preprocess_input(img)
-        img = tf.expand_dims(img, axis=0)
-        predictions = self.model.predict(img)
+        predictions = self.model.predict(self.preprocess(img_path))
         return float(predictions[0][0])
 
 # ------------------ NSFW Hub Model ------------------
 class NsfwHubModel(BaseNSFWModel):
+    input_spec = NSFW_HUB_SPEC
+
     def load(self):
         self.model = hub.load("https://tfhub.dev/GourmetAI/nsfw_classifier/1")
 
     def predict(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = tf.cast(img, tf.float32) / 255.0
-        img = tf.expand_dims(img, axis=0)
-        preds = self.model(img).numpy()[0]
+        preds = self.model(self.preprocess(img_path)).numpy()[0]
         return float(max(preds[1], preds[3], preds[4]))
 
 # ------------------ TF Hub Model ------------------
 class TfHubModel(BaseNSFWModel):
+    input_spec = TF_HUB_SPEC
+
     def load(self):
         self.model = hub.load("https://tfhub.dev/google/openimages/v4/ssd/mobilenetv2/classification/4")
 
     def predict(self, img_path: str) -> float:
-        img = tf.io.read_file(img_path)
-        img = tf.image.decode_jpeg(img, channels=3)
-        img = tf.image.resize(img, [224, 224])
-        img = tf.expand_dims(img, axis=0)
-        return float(self.model(img).numpy()[0][1])
+        return float(self.model(self.preprocess(img_path)).numpy()[0][1])
 
 
 # analyzer.py (переписанные части)
@@ -0,0 +1,197 @@
+import tkinter as tk
+from tkinter import ttk
+
+WHEEL_ROWS = 3  # строк за один шаг колеса мыши
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_HEADER_HEIGHT = 25
+
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+
+
+class VirtualTable:
+    """Treeview, в котором существуют только видимые строки FileStore.
+
+    Прокрутка, выделение и навигация с клавиатуры ведутся по позициям в store.view,
+    поэтому стоимость отрисовки не зависит от числа файлов. iid строк Treeview — str(row_id).
+    """
+
+    def __init__(self, parent, store, columns, on_select=None, on_sort=None):
+        self.store = store
+        self.on_select = on_select
+        self.on_sort = on_sort
+
+        self.offset = 0  # позиция в view первой видимой строки
+        self.visible = 1  # сколько строк помещается в окне
+        self.row_height = DEFAULT_ROW_HEIGHT
+        self.header_height = DEFAULT_HEADER_HEIGHT
+        self.cursor = None  # позиция активной строки в view
+        self.anchor = None  # начало диапазона для Shift+клик
+        self.selected = set()  # row_id выделенных строк
+
+        self.frame = tk.Frame(parent)
+
+        self.scroll_y = ttk.Scrollbar(self.frame, command=self.yview)
+        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.scroll_x = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL)
+        self.scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+
+        # selectmode="none": выделение храним сами, Treeview только показывает его для видимых строк
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="none",
+                                 xscrollcommand=self.scroll_x.set)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.scroll_x.config(command=self.tree.xview)
+
+        for col in columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.on_sort and self.on_sort(c))
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_rows(WHEEL_ROWS))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                          ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(key, lambda e, s=step: self._on_key(s))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    # ---------------------- ОТРИСОВКА ----------------------
+    def refresh(self):
+        """Перерисовывает видимое окно (после изменения данных, фильтра или сортировки)"""
+        view = self.store.view
+        total = len(view)
+        self.offset = max(0, min(self.offset, total - self.visible))
+
+        self.tree.delete(*self.tree.get_children())
+        shown_selected = []
+        for row_id in view[self.offset:self.offset + self.visible]:
+            if self.store.paths[row_id] is None:
+                continue
+            values, tag = self.store.render(row_id)
+            iid = self.tree.insert("", "end", iid=str(row_id), values=values, tags=(tag,) if tag else ())
+            if row_id in self.selected:
+                shown_selected.append(iid)
+        self.tree.selection_set(shown_selected)
+
+        if total:
+            self.scroll_y.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scroll_y.set(0.0, 1.0)
+
+    def reset(self):
+        """Сбрасывает прокрутку и выделение (новая папка или новый фильтр)"""
+        self.offset = 0
+        self.cursor = None
+        self.anchor = None
+        self.selected.clear()
+        self.refresh()
+
+    def _on_configure(self, event):
+        # Высота строки и заголовка — по первой отрисованной строке, если она есть
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if bbox:
+            self.header_height = bbox[1]
+            self.row_height = bbox[3] or DEFAULT_ROW_HEIGHT
+        visible = max(1, (event.height - self.header_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    # ---------------------- ПРОКРУТКА ----------------------
+    def yview(self, *args):
+        """command для вертикального Scrollbar: moveto / scroll units|pages"""
+        total = len(self.store.view)
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self.refresh()
+
+    def _scroll_rows(self, rows):
+        self.offset += rows
+        self.refresh()
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_rows(-WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS)
+
+    def see(self, pos):
+        """Прокручивает так, чтобы позиция pos в view была видна"""
+        if pos < self.offset:
+            self.offset = pos
+        elif pos >= self.offset + self.visible:
+            self.offset = pos - self.visible + 1
+
+    # ---------------------- ВЫДЕЛЕНИЕ ----------------------
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # заголовки и разделители столбцов — стандартная обработка
+        iid = self.tree.identify_row(event.y)
+        if not iid:
+            return "break"
+        self.tree.focus_set()
+        pos = self.offset + self.tree.index(iid)
+        row_id = int(iid)
+
+        if event.state & SHIFT_MASK and self.anchor is not None:
+            start, end = sorted((self.anchor, pos))
+            self.selected = set(self.store.view[start:end + 1])
+        elif event.state & CONTROL_MASK:
+            self.selected ^= {row_id}
+            self.anchor = pos
+        else:
+            self.selected = {row_id}
+            self.anchor = pos
+        self.cursor = pos
+        self._selection_changed()
+        return "break"
+
+    def _on_key(self, step):
+        total = len(self.store.view)
+        if not total:
+            return "break"
+        pos = self.cursor if self.cursor is not None else self.offset
+        if step == "home":
+            pos = 0
+        elif step == "end":
+            pos = total - 1
+        elif step == "page":
+            pos += self.visible
+        elif step == "-page":
+            pos -= self.visible
+        elif self.cursor is not None:
+            pos += step
+        pos = max(0, min(pos, total - 1))
+
+        self.cursor = self.anchor = pos
+        self.selected = {self.store.view[pos]}
+        self.see(pos)
+        self._selection_changed()
+        return "break"
+
+    def _selection_changed(self):
+        self.refresh()
+        if self.on_select:
+            self.on_select()
+
+    def selected_rows(self):
+        """row_id выделенных строк в порядке отображения"""
+        if not self.selected:
+            return []
+        return [row_id for row_id in self.store.view if row_id in self.selected]
+
+    def current_row(self):
+        """row_id активной строки (последней выбранной) или None"""
+        view = self.store.view
+        if self.cursor is None or self.cursor >= len(view):
+            return None
+        row_id = view[self.cursor]
+        return row_id if row_id in self.selected else None
+
+    def forget(self, row_id):
+        self.selected.discard(row_id)
@@ -0,0 +1,256 @@
+"""Режим наблюдения за папкой: новые и изменённые изображения анализируются по мере появления"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from analyzer import coalesced_on_item, ensure_model, post_log, run_analysis
+from scanner import SUPPORTED_FORMATS, iter_image_files
+from ui_updates import UpdateCoalescer
+
+WATCH_SETTLE = 1.0  # файл считается дописанным, если его размер и mtime не менялись столько секунд
+WATCH_POLL_INTERVAL = 2.0  # период обхода папки в режиме опроса (без inotify)
+WATCH_MAX_WAIT = 0.5  # сколько ждём событий за один вызов ready()
+WATCH_MAX_BATCH = 256  # не больше файлов в одном запуске анализа
+WATCH_OPEN_TIMEOUT = 30.0  # файл, открытый на запись без изменений дольше этого, всё же анализируется
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyBackend:
+    """События ядра Linux через libc (без сторонних пакетов); подпапки добавляются по мере появления"""
+
+    name = "inotify"
+
+    def __init__(self, folder_path):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.dirs = {}  # wd -> путь папки
+        self.add_tree(folder_path)
+
+    def add_tree(self, folder_path):
+        """Ставит наблюдение на папку и все подпапки; возвращает уже лежащие в новых папках изображения
+        в виде [(путь, True), ...] — о записи в них событий уже не будет"""
+        found = []
+        pending = [folder_path]
+        while pending:
+            directory = pending.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                continue  # нет прав или папка уже удалена
+            self.dirs[wd] = directory
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.name.lower().endswith(SUPPORTED_FORMATS):
+                            found.append((entry.path, True))
+            except OSError:
+                continue
+        return found
+
+    def poll(self, timeout):
+        """[(путь, закрыт ли после записи), ...] за timeout секунд; None — очередь ядра переполнилась.
+
+        IN_CREATE / IN_MODIFY — файл ещё пишется, IN_CLOSE_WRITE / IN_MOVED_TO — запись закончена.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    paths.extend(self.add_tree(path))  # файлы могли появиться раньше, чем поставлено наблюдение
+            elif name.lower().endswith(SUPPORTED_FORMATS):
+                paths.append((path, bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO))))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """Запасной вариант (Windows, macOS, нет inotify): периодический обход и сравнение размера и mtime"""
+
+    name = "polling"
+
+    def __init__(self, folder_path, interval=WATCH_POLL_INTERVAL):
+        self.folder_path = folder_path
+        self.interval = interval
+        self.known = {path: (size, mtime_ns) for path, size, mtime_ns, _ in iter_image_files(folder_path)}
+        self.next_poll = time.monotonic() + interval
+
+    def poll(self, timeout):
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self.next_poll = time.monotonic() + self.interval
+
+        paths = []
+        for path, size, mtime_ns, _ in iter_image_files(self.folder_path):
+            if self.known.get(path) != (size, mtime_ns):
+                self.known[path] = (size, mtime_ns)
+                paths.append((path, True))  # открыт ли файл, опрос не знает — остаётся только settle
+        return paths
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """Отдаёт новые и изменённые изображения, когда запись в них закончилась.
+
+    Событие только помечает файл; он уходит в анализ, когда запись закрыта (inotify) и его размер
+    и mtime не менялись settle секунд — недописанные копирования и загрузки не анализируются,
+    даже если пишущий процесс надолго замер.
+    Задержка от закрытия файла до вердикта — settle + ожидание события + время анализа пачки.
+    """
+
+    def __init__(self, folder_path, settle=WATCH_SETTLE, use_inotify=True):
+        self.folder_path = folder_path
+        self.settle = settle
+        self.pending = {}  # путь -> [(size, mtime_ns), с какого момента не меняется, открыт ли на запись]
+        self.backend = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.backend = InotifyBackend(folder_path)
+            except (OSError, AttributeError):
+                self.backend = None
+        if self.backend is None:
+            self.backend = PollingBackend(folder_path)
+        self.last_sync_ns = time.time_ns()
+
+    def ready(self, timeout=WATCH_MAX_WAIT):
+        """Файлы, запись в которые завершилась: [(путь, size, mtime_ns, inode), ...]"""
+        touched = self.backend.poll(timeout)
+        if touched is None:
+            touched = self._resync()
+        else:
+            self.last_sync_ns = time.time_ns()
+
+        now = time.monotonic()
+        for path, closed in touched:
+            if self._observe(path, now) is not None:
+                self.pending[path][2] = not closed
+
+        done = []
+        for path, (_, since, writing) in list(self.pending.items()):
+            if now - since < (WATCH_OPEN_TIMEOUT if writing else self.settle):
+                continue
+            entry = self._observe(path, now)
+            if entry is not None and self.pending[path][1] == since:
+                # Не изменился за settle секунд — готов
+                del self.pending[path]
+                done.append(entry)
+        return done
+
+    def _observe(self, path, now):
+        """Обновляет подпись файла; если она изменилась, отсчёт settle начинается заново"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)  # удалён или переименован до готовности
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        previous = self.pending.get(path)
+        if previous is None:
+            self.pending[path] = [signature, now, False]
+        elif previous[0] != signature:
+            previous[0] = signature
+            previous[1] = now
+        return path, stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _resync(self):
+        """После переполнения очереди inotify: всё, что менялось с последней синхронизации"""
+        since_ns = self.last_sync_ns - int(self.settle * 1e9)
+        self.last_sync_ns = time.time_ns()
+        return [(path, True) for path, _, mtime_ns, _ in iter_image_files(self.folder_path) if mtime_ns >= since_ns]
+
+    def close(self):
+        self.backend.close()
+
+
+def watch_folder(self, folder_path, threshold, on_item, add_entries, should_stop):
+    """Цикл наблюдения без Tk: готовые файлы анализируются пачками до WATCH_MAX_BATCH, пока should_stop() ложно.
+
+    add_entries([(путь, size, mtime_ns, inode), ...]) регистрирует файлы (таблица GUI или file_stats CLI)
+    и возвращает jobs [(item, путь)] для run_analysis; on_item — как у run_analysis.
+    Возвращает число проанализированных файлов.
+    """
+    watcher = FolderWatcher(folder_path, settle=getattr(self, "watch_settle", WATCH_SETTLE),
+                            use_inotify=getattr(self, "watch_inotify", True))
+    post_log(self, f"👁 Наблюдение за {folder_path}: {watcher.backend.name}, "
+                   f"файл готов через {watcher.settle:.1f} с без изменений\n")
+    analyzed = 0
+    try:
+        while not should_stop():
+            entries = watcher.ready()
+            for start in range(0, len(entries), WATCH_MAX_BATCH):
+                jobs = add_entries(entries[start:start + WATCH_MAX_BATCH])
+                # Пул процессов на каждую маленькую пачку дороже самого анализа — всегда потоки;
+                # замер батча из одного на каждой пачке утроил бы число прогонов модели
+                run_analysis(self, jobs, threshold, on_item, execution_mode="threads", quiet=True, calibrate=False)
+                analyzed += len(jobs)
+    finally:
+        watcher.close()
+    return analyzed
+
+
+def watch_images(self, folder_path):
+    """Поток GUI-режима «Наблюдать»: новые файлы появляются в таблице и сразу анализируются"""
+    threshold = self.threshold_slider.get()
+    coalescer = UpdateCoalescer(self.image_queue, None)
+
+    def add_entries(entries):
+        self.file_store.add_many(entries)
+        self.root.after(0, self.schedule_table_refresh)
+        return [(self.file_store.row_id(path), path) for path, _, _, _ in entries]
+
+    def should_stop():
+        return not self.watching or not self.running
+
+    analyzed = 0
+    try:
+        ensure_model(self)  # ошибка загрузки модели тоже должна вернуть кнопки (watch_stopped)
+        analyzed = watch_folder(self, folder_path, threshold, coalesced_on_item(self, coalescer, threshold),
+                                add_entries, should_stop)
+    except Exception as e:
+        self.image_queue.put(("log", f"❌ Ошибка наблюдения: {e}\n"))
+    finally:
+        coalescer.close()
+        self.image_queue.put(("log", f"👁 Наблюдение остановлено, проанализировано {analyzed} файлов\n"))
+        self.image_queue.put(("watch_stopped", ""))